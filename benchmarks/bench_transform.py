@@ -0,0 +1,115 @@
+"""
+Benchmark del marcado de ultima_actualizacion y de la fusión de cambios acumulados.
+
+Compara la versión anterior (to_dict + bucles por registro y dict por referencia)
+con la vectorizada que usa main.py (columna asignada con assign, fusión con
+concat + drop_duplicates y una sola conversión a registros al serializar con
+dataframe_to_records), y comprueba que ambas producen los mismos registros.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_transform.py [--rows 1000000] [--changes 100000]
+"""
+import os
+import sys
+import argparse
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libs.fileio import dataframe_to_records
+
+def make_articles(rows: int, offset: int = 0, seed: int = 0) -> pd.DataFrame:
+    """Artículos sintéticos con las columnas que produce clean_dataframe"""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(offset, offset + rows)
+    return pd.DataFrame({
+        'referencia': [f"A{i:08d}" for i in ids],
+        'referencia_proveedor': [f"P{i:08d}" for i in ids],
+        'descripcion': [f"Artículo de prueba {i}" for i in ids],
+        'cantidad_bulto': rng.integers(1, 50, rows),
+        'unidad_venta': rng.integers(1, 10, rows),
+        'familia': rng.choice(['TORNILLERIA', 'FERRETERIA', 'ELECTRICIDAD', 'FONTANERIA'], rows),
+        'stock_actual': rng.integers(0, 1000, rows),
+        'precio_actual': rng.random(rows).round(2) * 100,
+        'descuento': '0000',
+        'localizacion': 'SU',
+        'estado': 'A'
+    })
+
+def stamp_loop(df: pd.DataFrame, timestamp: int) -> list:
+    """Versión anterior: registros y bucle por producto"""
+    products = df.to_dict(orient='records')
+    for product in products:
+        product['ultima_actualizacion'] = timestamp
+    return products
+
+def stamp_vectorized(df: pd.DataFrame, timestamp: int) -> list:
+    return dataframe_to_records(df.assign(ultima_actualizacion=timestamp))
+
+def merge_loop(existing: list, new_changes: list) -> list:
+    """Versión anterior: dict por referencia"""
+    changes_dict = {change['referencia']: change for change in existing}
+    for change in new_changes:
+        changes_dict[change['referencia']] = change
+    return list(changes_dict.values())
+
+def merge_vectorized(existing: pd.DataFrame, new_changes: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat(
+        [existing, new_changes], ignore_index=True
+    ).drop_duplicates(subset='referencia', keep='last')
+
+def to_records(df: pd.DataFrame) -> list:
+    return df.to_dict(orient='records')
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def by_reference(records: list) -> dict:
+    return {record['referencia']: record for record in records}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help="artículos en la base completa")
+    parser.add_argument('--changes', type=int, default=100_000,
+                        help="cambios nuevos (la mitad actualiza artículos existentes)")
+    args = parser.parse_args()
+    
+    timestamp = int(datetime.now().timestamp() * 1000)
+    print(f"Generando {args.rows} artículos y {args.changes} cambios...")
+    articles = make_articles(args.rows)
+    changes = make_articles(args.changes, offset=args.rows - args.changes // 2, seed=1)
+    
+    # 1. Marcado de ultima_actualizacion, incluida la conversión a registros
+    loop_records, loop_seconds = timed(stamp_loop, articles, timestamp)
+    vector_records, vector_seconds = timed(stamp_vectorized, articles, timestamp)
+    assert loop_records == vector_records, "el marcado vectorizado no coincide"
+    
+    # 2. Fusión de cambios acumulados: dict sobre registros frente a DataFrames
+    existing_df = articles.assign(ultima_actualizacion=timestamp)
+    changes_df = changes.assign(ultima_actualizacion=timestamp + 1)
+    existing_records = dataframe_to_records(existing_df)
+    change_records = dataframe_to_records(changes_df)
+    merged_loop, merge_loop_seconds = timed(merge_loop, existing_records, change_records)
+    merged_df, merge_vector_seconds = timed(merge_vectorized, existing_df, changes_df)
+    
+    # 3. Conversión a registros del resultado, una sola vez al serializar
+    merged_to_dict, to_dict_seconds = timed(to_records, merged_df)
+    merged_vector, records_seconds = timed(dataframe_to_records, merged_df)
+    assert merged_to_dict == merged_vector, "dataframe_to_records no coincide con to_dict"
+    assert len(merged_loop) == len(merged_vector)
+    assert by_reference(merged_loop) == by_reference(merged_vector), "la fusión vectorizada no coincide"
+    
+    print(f"\n{'Operación':<40}{'Anterior (s)':>14}{'Nuevo (s)':>12}{'Mejora':>10}")
+    for name, before, after in [
+        (f"Marcado + registros ({args.rows} filas)", loop_seconds, vector_seconds),
+        (f"Fusión ({len(merged_df)} filas)", merge_loop_seconds, merge_vector_seconds),
+        ("to_dict / dataframe_to_records", to_dict_seconds, records_seconds),
+    ]:
+        print(f"{name:<40}{before:>14.3f}{after:>12.3f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
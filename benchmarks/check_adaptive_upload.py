@@ -0,0 +1,169 @@
+"""
+Comprobación de las subidas a Drive contra un endpoint local simulado.
+
+Levanta un servidor HTTP que imita la API de Drive v3 (about, files.list,
+subida simple y subida reanudable por fragmentos) con una latencia por petición
+y un ancho de banda configurables, y usa DriveManager con un transporte
+inyectado (http) para comprobar que:
+  - un archivo pequeño se sube en una sola petición, sin sesión reanudable;
+  - con ancho de banda alto el tamaño de fragmento crece;
+  - con ancho de banda bajo el tamaño de fragmento se reduce;
+  - los MB/s registrados en upload_stats corresponden a los bytes y tiempos medidos.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/check_adaptive_upload.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+import httplib2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libs.chunk_sizer import AdaptiveChunkSizer
+from libs.drive_manager import DriveManager
+
+MB = 1024 * 1024
+FOLDER = "ARTICULOS JSON"
+FOLDER_ID = "carpeta1"
+
+class FakeDrive(BaseHTTPRequestHandler):
+    """Endpoint de Drive v3 simulado; cada petición tarda latency + bytes / bandwidth"""
+    
+    protocol_version = 'HTTP/1.1'
+    latency = 0.02
+    bandwidth = 64 * MB  # bytes/s
+    log = []  # ('simple' | 'init' | 'chunk', bytes)
+    
+    def log_message(self, *args):
+        pass
+    
+    def _read_body(self) -> bytes:
+        body = self.rfile.read(int(self.headers.get('content-length') or 0))
+        time.sleep(self.latency + len(body) / self.bandwidth)
+        return body
+    
+    def _send(self, code: int, payload=None, headers: dict = None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(code)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        path = unquote(self.path)
+        if '/about' in path:
+            self._send(200, {'user': {'emailAddress': 'check@local'}, 'storageQuota': {}})
+        elif 'google-apps.folder' in path:
+            self._send(200, {'files': [{'id': FOLDER_ID, 'name': FOLDER}]})
+        else:
+            self._send(200, {'files': []})
+    
+    def do_POST(self):
+        body = self._read_body()
+        if 'uploadType=resumable' in self.path:
+            FakeDrive.log.append(('init', len(body)))
+            host, port = self.server.server_address
+            self._send(200, headers={'location': f"http://{host}:{port}/sesion/{len(FakeDrive.log)}"})
+        else:
+            FakeDrive.log.append(('simple', len(body)))
+            self._send(200, {'id': 'archivo-simple'})
+    
+    def do_PUT(self):
+        body = self._read_body()
+        FakeDrive.log.append(('chunk', len(body)))
+        match = re.match(r'bytes (\d+)-(\d+)/(\d+|\*)', self.headers['content-range'])
+        end, total = int(match.group(2)), match.group(3)
+        if total != '*' and end + 1 == int(total):
+            self._send(200, {'id': 'archivo-reanudable'})
+        else:
+            self._send(308, headers={'range': f"bytes=0-{end}"})
+
+class LocalHttp(httplib2.Http):
+    """
+    Transporte hacia el servidor local: la librería construye la URI de subida
+    con https, y 308 es la respuesta de progreso de la subida, no una redirección
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.redirect_codes = self.redirect_codes - {308}
+    
+    def request(self, uri, *args, **kwargs):
+        return super().request(uri.replace('https://', 'http://'), *args, **kwargs)
+
+def new_chunk_sizer() -> AdaptiveChunkSizer:
+    return AdaptiveChunkSizer(initial=8 * MB, minimum=1 * MB, maximum=64 * MB, target_seconds=0.5)
+
+def make_manager(endpoint: str, work_dir: str) -> DriveManager:
+    manager = DriveManager(
+        session_store_path=os.path.join(work_dir, 'upload_sessions.json'),
+        folder_path=FOLDER,
+        http=LocalHttp(),
+        client_options={'api_endpoint': endpoint}
+    )
+    assert manager.connect(), "no se pudo conectar con el endpoint simulado"
+    return manager
+
+def upload(manager: DriveManager, work_dir: str, filename: str, size: int, bandwidth: float) -> dict:
+    path = os.path.join(work_dir, filename)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    # Cada escenario parte del tamaño inicial, sin lo aprendido en el anterior
+    manager.chunk_sizer = new_chunk_sizer()
+    FakeDrive.bandwidth = bandwidth
+    FakeDrive.log = []
+    assert manager.upload_file(path, filename, FOLDER), f"falló la subida de {filename}"
+    return manager.stats(filename)
+
+def check_throughput(stats: dict, size: int):
+    assert stats['mb'] == round(size / MB, 2), stats
+    assert abs(stats['mb_per_s'] - stats['mb'] / stats['seconds']) <= 0.05 * stats['mb_per_s'], stats
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDrive)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/"
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = make_manager(endpoint, work_dir)
+        
+        # 1. Archivo pequeño: una sola petición multipart, sin sesión reanudable
+        small_size = 64 * 1024
+        stats = upload(manager, work_dir, 'version.json', small_size, 64 * MB)
+        assert [kind for kind, _ in FakeDrive.log] == ['simple'], FakeDrive.log
+        assert stats['requests'] == 1, stats
+        assert stats['mb'] >= round(small_size / MB, 2), stats
+        print(f"✅ Subida simple: {stats}")
+        
+        # 2. Ancho de banda alto: los fragmentos crecen desde el tamaño inicial
+        size = 96 * MB
+        stats = upload(manager, work_dir, 'crece.json', size, 64 * MB)
+        sizes = stats['chunk_sizes_mb']
+        assert FakeDrive.log[0][0] == 'init', FakeDrive.log[:2]
+        assert sizes[0] == 8 and max(sizes[1:-1]) > 8, sizes
+        check_throughput(stats, size)
+        print(f"✅ Fragmentos crecientes: {sizes} MB, {stats['mb_per_s']} MB/s")
+        
+        # 3. Ancho de banda bajo: los fragmentos se reducen
+        size = 16 * MB
+        stats = upload(manager, work_dir, 'decrece.json', size, 4 * MB)
+        sizes = stats['chunk_sizes_mb']
+        assert sizes[0] == 8 and max(sizes[1:]) < 8, sizes
+        assert stats['mb_per_s'] < 4.5, stats
+        check_throughput(stats, size)
+        print(f"✅ Fragmentos decrecientes: {sizes} MB, {stats['mb_per_s']} MB/s")
+    
+    server.shutdown()
+    print("\n✅ Subida adaptativa verificada contra el endpoint simulado")
+
+if __name__ == "__main__":
+    main()
@@ -33,5 +33,62 @@ ouputDir = ROOT_DIR + "\\output\\"
 ouputFullDataDrive = "G:\\Mi unidad\\ARTICULOS JSON\\last_full_data.json"
 pathProcess = "\\processed\\" + str(today.year) + "\\" + months
 
+# Destinos de publicación: 'drive' (API de Google Drive), 'local' (carpeta compartida
+# en LAN_SHARE_DIR) y 's3' (bucket compatible con S3, p. ej. MinIO). Cada archivo se
+# publica en todos a la vez; 'local' y 's3' solo se usan si están configurados
+PUBLISH_SINKS = ['drive', 'local', 's3']
+LAN_SHARE_DIR = os.getenv('LAN_SHARE_DIR')  # p. ej. \\servidor\articulos o una unidad mapeada
+S3_CONFIG = {
+    'endpoint_url': os.getenv('S3_ENDPOINT_URL'),  # p. ej. http://localhost:9000 para MinIO
+    'bucket': os.getenv('S3_BUCKET'),
+    'prefix': os.getenv('S3_PREFIX', 'articulos-json'),
+    'access_key': os.getenv('S3_ACCESS_KEY'),
+    'secret_key': os.getenv('S3_SECRET_KEY'),
+    'region': os.getenv('S3_REGION'),
+    'create_bucket': os.getenv('S3_CREATE_BUCKET', '').lower() in ('1', 'true')  # solo si se pide
+}
+
 # Configuración de consulta
-QUERY_TIMEOUT = 300  # 5 minutos timeout para queries grandes
\ No newline at end of file
+QUERY_TIMEOUT = 300  # 5 minutos timeout para queries grandes
+
+# Configuración de subidas reanudables a Google Drive
+uploadSessionsFile = ouputDir + "upload_sessions.json"
+UPLOAD_SESSION_MAX_AGE = 60 * 60 * 24  # 24 horas; Drive invalida las sesiones tras una semana
+
+# Tamaño de fragmento adaptativo (bytes): se ajusta para que cada fragmento tarde unos
+# UPLOAD_CHUNK_TARGET_SECONDS. Los archivos pequeños se suben en una sola petición
+UPLOAD_CHUNK_INITIAL = 1024 * 1024 * 8
+UPLOAD_CHUNK_MIN = 1024 * 1024
+UPLOAD_CHUNK_MAX = 1024 * 1024 * 64
+UPLOAD_CHUNK_TARGET_SECONDS = 4
+UPLOAD_SINGLE_REQUEST_MAX = 1024 * 1024 * 5  # límite recomendado por Drive para subidas simples
+
+# Límites de tiempo de la ejecución (segundos)
+RUN_DEADLINE = 50 * 60  # margen antes de la siguiente ejecución horaria
+STAGE_BUDGETS = {
+    'incremental': 5 * 60,
+    'full_snapshot': 20 * 60,
+    'derived': 5 * 60,  # formatos adicionales, índice y agregados
+    'upload': 20 * 60
+}
+MIN_STAGE_TIME = 30  # no se inicia una etapa con menos tiempo restante que este
+
+# Diario de ejecución: un reintento dentro de este plazo retoma la etapa fallida;
+# pasado el plazo se inicia una ejecución nueva para no dejar huecos en la ventana incremental
+runJournalFile = ouputDir + "run_journal.json"
+RUN_JOURNAL_MAX_AGE = 55 * 60
+
+# Modo de ejecución: 'sequential', 'pipelined' (sube los cambios mientras se consulta
+# la base completa) o 'streaming' (además sube la base completa a medida que se genera)
+PIPELINE_MODE = 'sequential'
+STREAM_CHUNK_ROWS = 50000
+
+# Presupuesto de memoria (MB). Si los datos lo superan se procesan en disco; None lo desactiva
+MEMORY_BUDGET_MB = 512
+SPILL_DATA_RATIO = 0.5  # fracción del presupuesto para datos; el resto queda para el intérprete y librerías
+
+# Ejecución única: una ejecución que encuentra otra en curso deja una marca pendiente
+# y termina; la ejecución en curso hace un ciclo adicional al acabar
+runLockFile = ouputDir + "run.lock"
+runPendingDir = ouputDir + "run_pending"  # una marca (archivo .request) por ejecución solicitada
+RUN_LOCK_MAX_AGE = 3 * 60 * 60  # pasado este tiempo el bloqueo se considera obsoleto aunque el PID exista
@@ -0,0 +1,116 @@
+import pandas as pd
+from libs.fileio import iter_json_array, write_json_atomic, read_json
+
+def iter_json_dataframes(path: str, chunksize: int = 50000):
+    """Recorre un artefacto JSON (array de objetos) en bloques de DataFrame"""
+    batch = []
+    for record in iter_json_array(path):
+        batch.append(record)
+        if len(batch) >= chunksize:
+            yield pd.DataFrame(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+def family_aggregates(chunks) -> list:
+    """
+    Agregados por familia (número de artículos, stock total y rango de precios),
+    calculados por bloque con groupby y combinados al final
+    """
+    partials = [
+        df.groupby('familia').agg(
+            articulos=('referencia', 'size'),
+            stock_total=('stock_actual', 'sum'),
+            precio_min=('precio_actual', 'min'),
+            precio_max=('precio_actual', 'max')
+        )
+        for df in chunks if not df.empty
+    ]
+    if not partials:
+        return []
+    
+    combined = pd.concat(partials).groupby(level=0).agg({
+        'articulos': 'sum',
+        'stock_total': 'sum',
+        'precio_min': 'min',
+        'precio_max': 'max'
+    })
+    return combined.rename_axis('familia').reset_index().to_dict(orient='records')
+
+def tokenize_descriptions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pares (referencia, token) de las descripciones normalizadas: sin acentos,
+    en minúsculas y separadas en palabras alfanuméricas de 2 o más caracteres
+    """
+    normalized = (
+        df['descripcion'].fillna('').astype(str)
+        .str.normalize('NFKD')
+        .str.encode('ascii', errors='ignore')
+        .str.decode('ascii')
+        .str.lower()
+    )
+    pairs = pd.DataFrame({
+        'referencia': df['referencia'].astype(str),
+        'token': normalized.str.findall(r'[a-z0-9]{2,}')
+    })
+    return pairs.explode('token').dropna(subset=['token']).drop_duplicates()
+
+class DescriptionIndex:
+    """
+    Índice invertido token -> referencias sobre la descripción de los artículos.
+    Guarda también los tokens de cada referencia para poder actualizarlo con los
+    cambios del día sin reconstruirlo desde la base completa.
+    """
+    
+    def __init__(self, documents: dict = None):
+        self.documents = documents or {}
+        self.tokens = {}
+        for referencia, tokens in self.documents.items():
+            for token in tokens:
+                self.tokens.setdefault(token, set()).add(referencia)
+    
+    @classmethod
+    def load(cls, state_path: str) -> 'DescriptionIndex':
+        state = read_json(state_path, default={})
+        return cls(state.get('documents', {}))
+    
+    def update(self, df: pd.DataFrame):
+        """Indexa (o reindexa) los artículos del DataFrame"""
+        if df.empty:
+            return
+        
+        grouped = tokenize_descriptions(df).groupby('referencia')['token'].agg(sorted)
+        for referencia in df['referencia'].astype(str).unique():
+            self._remove(referencia)
+            
+            new_tokens = grouped.get(referencia, [])
+            if new_tokens:
+                self.documents[referencia] = new_tokens
+                for token in new_tokens:
+                    self.tokens.setdefault(token, set()).add(referencia)
+    
+    def retain(self, referencias: set) -> int:
+        """
+        Elimina los artículos que no están en referencias (p. ej. dados de baja en la
+        base completa); retorna cuántos se eliminaron
+        """
+        removed = [referencia for referencia in self.documents if referencia not in referencias]
+        for referencia in removed:
+            self._remove(referencia)
+        return len(removed)
+    
+    def _remove(self, referencia: str):
+        for token in self.documents.pop(referencia, []):
+            references = self.tokens.get(token)
+            if references is not None:
+                references.discard(referencia)
+                if not references:
+                    del self.tokens[token]
+    
+    def save(self, state_path: str, artifact_path: str):
+        """Guarda el estado local y el artefacto publicado (solo token -> referencias)"""
+        write_json_atomic(state_path, {'documents': self.documents}, indent=None)
+        write_json_atomic(artifact_path, {
+            'documents': len(self.documents),
+            'tokens': {token: sorted(self.tokens[token]) for token in sorted(self.tokens)}
+        }, indent=None)
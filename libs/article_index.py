@@ -0,0 +1,94 @@
+import os
+import json
+import sqlite3
+from pathlib import Path
+from typing import Optional
+from libs.fileio import iter_json_array
+
+def build_article_index(source_path: str, index_path: str, batch_size: int = 10000) -> int:
+    """
+    Construye el índice de búsqueda a partir de last_full_data.json: un archivo
+    SQLite compacto con los registros ordenados por referencia (B-tree) y un
+    índice secundario por referencia_proveedor. Retorna el número de artículos
+    indexados; las referencias repetidas se quedan con el último registro.
+    """
+    temp_path = f"{index_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute("PRAGMA journal_mode=OFF")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.execute(
+            "CREATE TABLE articulos ("
+            "referencia TEXT PRIMARY KEY, referencia_proveedor TEXT, registro TEXT NOT NULL"
+            ") WITHOUT ROWID")
+        
+        insert = "INSERT OR REPLACE INTO articulos VALUES (?, ?, ?)"
+        read_count = 0
+        batch = []
+        for record in iter_json_array(source_path):
+            batch.append((
+                record['referencia'],
+                record.get('referencia_proveedor'),
+                json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+            ))
+            if len(batch) >= batch_size:
+                connection.executemany(insert, batch)
+                read_count += len(batch)
+                batch = []
+        if batch:
+            connection.executemany(insert, batch)
+            read_count += len(batch)
+        
+        # El índice secundario se crea al final: más rápido y más compacto
+        connection.execute("CREATE INDEX idx_referencia_proveedor ON articulos (referencia_proveedor)")
+        connection.commit()
+        connection.execute("VACUUM")
+        
+        count = connection.execute("SELECT COUNT(*) FROM articulos").fetchone()[0]
+        if count < read_count:
+            print(f"⚠️ Índice de búsqueda: {read_count - count} referencias repetidas en {source_path}")
+    finally:
+        connection.close()
+    
+    os.replace(temp_path, index_path)
+    return count
+
+class ArticleIndex:
+    """
+    Lector del índice de artículos. Abre el archivo en solo lectura y lo mapea en
+    memoria, de modo que cada búsqueda es O(log n) sin parsear el JSON completo.
+    """
+    
+    def __init__(self, index_path: str, mmap_size: int = 256 * 1024 * 1024):
+        # immutable=1: el archivo publicado no cambia mientras se lee, no hacen falta bloqueos
+        uri = f"{Path(index_path).resolve().as_uri()}?mode=ro&immutable=1"
+        self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._connection.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+    
+    def by_referencia(self, referencia: str) -> Optional[dict]:
+        """Artículo con la referencia indicada o None"""
+        row = self._connection.execute(
+            "SELECT registro FROM articulos WHERE referencia = ?", (referencia,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def by_referencia_proveedor(self, referencia_proveedor: str) -> list:
+        """Artículos con la referencia de proveedor indicada (puede haber varios)"""
+        rows = self._connection.execute(
+            "SELECT registro FROM articulos WHERE referencia_proveedor = ? ORDER BY referencia",
+            (referencia_proveedor,)).fetchall()
+        return [json.loads(registro) for registro, in rows]
+    
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM articulos").fetchone()[0]
+    
+    def close(self):
+        self._connection.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
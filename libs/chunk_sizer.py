@@ -0,0 +1,70 @@
+from typing import Optional
+import config.setting as st
+
+# Drive exige fragmentos múltiplos de 256 KB (salvo el último)
+CHUNK_ALIGNMENT = 256 * 1024
+
+class AdaptiveChunkSizer:
+    """
+    Ajusta el tamaño de fragmento de las subidas reanudables a partir del tiempo
+    medido de cada fragmento. Modela cada petición como latencia + tamaño / ancho
+    de banda y elige el tamaño que tarda unos target_seconds: suficiente para que
+    la latencia por petición pese poco y acotado para que repetir un fragmento
+    fallido cueste poco. Entre fragmentos el tamaño como mucho se duplica o se
+    reduce a la mitad.
+    """
+    
+    def __init__(self, initial: int = st.UPLOAD_CHUNK_INITIAL, minimum: int = st.UPLOAD_CHUNK_MIN,
+                 maximum: int = st.UPLOAD_CHUNK_MAX, target_seconds: float = st.UPLOAD_CHUNK_TARGET_SECONDS,
+                 window: int = 8):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.window = window
+        self.chunksize = self._bound(initial)
+        self.samples = []  # (bytes, segundos) de los últimos fragmentos
+    
+    def record(self, sent_bytes: int, seconds: float):
+        """Registra un fragmento completado y recalcula el tamaño del siguiente"""
+        seconds = max(seconds, 1e-3)
+        self.samples = (self.samples + [(sent_bytes, seconds)])[-self.window:]
+        
+        latency, bandwidth = self.estimate()
+        ideal = bandwidth * max(self.target_seconds - latency, self.target_seconds / 2)
+        self.chunksize = self._bound(min(max(ideal, self.chunksize / 2), self.chunksize * 2))
+    
+    def record_failure(self):
+        """Un fragmento fallido reduce el tamaño a la mitad para abaratar el reintento"""
+        self.chunksize = self._bound(self.chunksize // 2)
+    
+    def estimate(self) -> tuple:
+        """
+        Latencia por petición (s) y ancho de banda (bytes/s) estimados por mínimos
+        cuadrados sobre los últimos fragmentos. Con un solo tamaño medido, o si el
+        ajuste no es válido, se atribuye todo el tiempo a la transferencia.
+        """
+        total_bytes = sum(size for size, _ in self.samples)
+        total_seconds = sum(seconds for _, seconds in self.samples)
+        fallback = (0.0, total_bytes / total_seconds)
+        
+        n = len(self.samples)
+        mean_size = total_bytes / n
+        mean_seconds = total_seconds / n
+        variance = sum((size - mean_size) ** 2 for size, _ in self.samples)
+        if variance == 0:
+            return fallback
+        
+        seconds_per_byte = sum(
+            (size - mean_size) * (seconds - mean_seconds) for size, seconds in self.samples
+        ) / variance
+        latency = mean_seconds - seconds_per_byte * mean_size
+        if seconds_per_byte <= 0 or latency < 0:
+            return fallback
+        return latency, 1 / seconds_per_byte
+    
+    def latency(self) -> Optional[float]:
+        return self.estimate()[0] if self.samples else None
+    
+    def _bound(self, size: float) -> int:
+        size = int(size) // CHUNK_ALIGNMENT * CHUNK_ALIGNMENT
+        return min(max(size, self.minimum), self.maximum)
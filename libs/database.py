@@ -2,6 +2,8 @@ import pandas as pd
 from sqlalchemy import create_engine, exc, text
 from sqlalchemy.engine import Engine
 import urllib.parse
+import math
+from typing import Iterator, Optional
 import config.setting as st
 
 def get_engine() -> Engine:
@@ -55,14 +57,24 @@ def get_engine() -> Engine:
         print(f"Error creando engine de SQLAlchemy: {e}")
         raise
 
-def execute_query(query: str) -> pd.DataFrame:
-    """Ejecuta una consulta y retorna un DataFrame usando SQLAlchemy"""
+def execute_query(query: str, timeout: Optional[float] = None) -> pd.DataFrame:
+    """
+    Ejecuta una consulta y retorna un DataFrame usando SQLAlchemy.
+    El timeout (segundos) se aplica a nivel de sentencia; por defecto st.QUERY_TIMEOUT
+    """
     try:
         print("#" * 5, " Conectando a la base de datos SQL Server...")
         engine = get_engine()
         
-        print("#" * 5, " Ejecutando consulta...")
-        df = pd.read_sql_query(query, engine)
+        timeout = st.QUERY_TIMEOUT if timeout is None else min(timeout, st.QUERY_TIMEOUT)
+        print("#" * 5, f" Ejecutando consulta (timeout {int(math.ceil(timeout))}s)...")
+        with engine.connect() as connection:
+            dbapi_connection = set_statement_timeout(connection, timeout)
+            try:
+                df = pd.read_sql_query(query, connection)
+            finally:
+                # No dejar el timeout en la conexión que vuelve al pool
+                dbapi_connection.timeout = 0
         
         print(f"#" * 5, f" Consulta ejecutada exitosamente. Filas obtenidas: {len(df)}")
         return df
@@ -71,6 +83,36 @@ def execute_query(query: str) -> pd.DataFrame:
         print(f"Error ejecutando consulta: {e}")
         raise
 
+def execute_query_chunks(query: str, chunksize: int, timeout: Optional[float] = None) -> Iterator[pd.DataFrame]:
+    """
+    Ejecuta una consulta y retorna sus filas en bloques de `chunksize` filas,
+    sin cargar el resultado completo en memoria
+    """
+    print("#" * 5, " Conectando a la base de datos SQL Server...")
+    engine = get_engine()
+    
+    timeout = st.QUERY_TIMEOUT if timeout is None else min(timeout, st.QUERY_TIMEOUT)
+    print("#" * 5, f" Ejecutando consulta por bloques de {chunksize} filas (timeout {int(math.ceil(timeout))}s)...")
+    with engine.connect() as connection:
+        dbapi_connection = set_statement_timeout(connection, timeout)
+        try:
+            total_rows = 0
+            for chunk in pd.read_sql_query(query, connection, chunksize=chunksize):
+                total_rows += len(chunk)
+                yield chunk
+            print(f"#" * 5, f" Consulta ejecutada exitosamente. Filas obtenidas: {total_rows}")
+        finally:
+            dbapi_connection.timeout = 0
+
+def set_statement_timeout(connection, timeout: float):
+    """Aplica el timeout de sentencia de pyodbc a la conexión DBAPI subyacente"""
+    pooled = connection.connection
+    # SQLAlchemy >= 1.4.24 expone dbapi_connection; versiones anteriores usan .connection
+    dbapi_connection = getattr(pooled, 'dbapi_connection', None) or pooled.connection
+    # pyodbc interpreta 0 como "sin límite", por eso el mínimo es 1 segundo
+    dbapi_connection.timeout = max(1, int(math.ceil(timeout)))
+    return dbapi_connection
+
 def test_connection() -> bool:
     """Prueba la conexión a la base de datos"""
     try:
@@ -0,0 +1,45 @@
+import time
+from typing import Optional
+import config.setting as st
+
+class DeadlineExceeded(Exception):
+    """La ejecución no dispone de tiempo suficiente para continuar"""
+
+class Deadline:
+    """Controla el tiempo límite global de una ejecución y el presupuesto de cada etapa"""
+    
+    def __init__(self, total_seconds: float = st.RUN_DEADLINE, stage_budgets: Optional[dict] = None):
+        self.total_seconds = total_seconds
+        self.stage_budgets = st.STAGE_BUDGETS if stage_budgets is None else stage_budgets
+        self._expires_at = time.monotonic() + total_seconds
+    
+    def remaining(self) -> float:
+        """Segundos restantes antes del límite"""
+        return max(0.0, self._expires_at - time.monotonic())
+    
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def stage(self, name: str) -> 'Deadline':
+        """
+        Crea el límite de una etapa: su presupuesto configurado, acotado por el
+        tiempo que le queda a la ejecución completa
+        """
+        budget = self.stage_budgets.get(name, self.remaining())
+        return Deadline(min(budget, self.remaining()), self.stage_budgets)
+    
+    def ensure(self, stage: str, min_seconds: float = st.MIN_STAGE_TIME):
+        """Lanza DeadlineExceeded si no queda tiempo suficiente para iniciar la etapa"""
+        remaining = self.remaining()
+        if remaining < min_seconds:
+            raise DeadlineExceeded(
+                f"Tiempo insuficiente para la etapa '{stage}': quedan {remaining:.0f}s")
+    
+    def check(self, stage: str):
+        """Lanza DeadlineExceeded si el límite ya ha vencido (p. ej. entre bloques de una etapa)"""
+        if self.expired():
+            raise DeadlineExceeded(f"Tiempo agotado durante la etapa '{stage}'")
+    
+    def allows_wait(self, seconds: float) -> bool:
+        """Indica si una espera (p. ej. backoff entre reintentos) cabe en el tiempo restante"""
+        return seconds < self.remaining()
@@ -1,56 +1,179 @@
 import os
 import pickle
 import json
+import hashlib
 import tempfile
 import uuid
 from typing import Optional
 from googleapiclient.discovery import build
 from googleapiclient.discovery import build
 from google.oauth2.service_account import Credentials
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaUpload
 from googleapiclient.errors import HttpError
 import time
+import threading
+import config.setting as st
+from libs.fileio import write_json_atomic, read_json
+from libs.formats import mimetype_for
+from libs.chunk_sizer import AdaptiveChunkSizer
+from libs.sinks import Sink
 
-class DriveManager:
-    """Clase para manejar la API de Google Drive"""
+class SourceAborted(Exception):
+    """El proceso que generaba el archivo en subida falló antes de terminarlo"""
+
+class GrowingFileUpload(MediaUpload):
+    """
+    Media reanudable para un archivo que todavía se está escribiendo.
+    Cada fragmento espera a que el productor haya escrito los bytes necesarios;
+    el productor llama a finish() al terminar o a abort() si falla, en cuyo caso
+    la sesión de subida nunca se finaliza y Drive conserva la versión anterior.
+    """
+    
+    def __init__(self, file_path: str, mimetype: str = 'application/json',
+                 chunksize: int = st.UPLOAD_CHUNK_INITIAL, poll_interval: float = 0.5):
+        self._file_path = file_path
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._poll_interval = poll_interval
+        self._done = threading.Event()
+        self._aborted = False
+    
+    def finish(self):
+        self._done.set()
+    
+    def abort(self):
+        self._aborted = True
+        self._done.set()
+    
+    def chunksize(self):
+        return self._chunksize
+    
+    def mimetype(self):
+        return self._mimetype
+    
+    def size(self):
+        # Mientras el archivo crece el tamaño total es desconocido ('*')
+        if self._done.is_set() and not self._aborted:
+            return os.path.getsize(self._file_path)
+        return None
+    
+    def resumable(self):
+        return True
+    
+    def has_stream(self):
+        return False
+    
+    def getbytes(self, begin, length):
+        while True:
+            if self._aborted:
+                raise SourceAborted(f"generación de {os.path.basename(self._file_path)} interrumpida")
+            done = self._done.is_set()
+            # Sin terminar se exige un byte más para no enviar nunca el último fragmento
+            # con tamaño total desconocido
+            if done or os.path.getsize(self._file_path) > begin + length:
+                with open(self._file_path, 'rb') as f:
+                    f.seek(begin)
+                    return f.read(length)
+            self._done.wait(self._poll_interval)
+
+class AdaptiveFileUpload(MediaFileUpload):
+    """
+    MediaFileUpload reanudable cuyo tamaño de fragmento lo decide chunk_sizer.
+    next_chunk() consulta chunksize() antes de cada fragmento, de modo que cada
+    petición usa el último tamaño calculado sin tocar atributos privados.
+    """
+    
+    def __init__(self, file_path: str, chunk_sizer: AdaptiveChunkSizer, mimetype: Optional[str] = None):
+        super().__init__(file_path, mimetype=mimetype, chunksize=chunk_sizer.chunksize, resumable=True)
+        self.chunk_sizer = chunk_sizer
+    
+    def chunksize(self):
+        return self.chunk_sizer.chunksize
+
+class DriveManager(Sink):
+    """Clase para manejar la API de Google Drive; como destino publica en folder_path"""
     
     SCOPES = ['https://www.googleapis.com/auth/drive']
+    key = 'drive'
+    name = 'Google Drive'
     
-    def __init__(self, service_account_path: str = 'credentials-service.json'):
+    def __init__(self, service_account_path: str = 'credentials-service.json',
+                 session_store_path: str = st.uploadSessionsFile, deadline=None,
+                 chunk_sizer: Optional[AdaptiveChunkSizer] = None,
+                 folder_path: Optional[str] = None, http=None,
+                 client_options: Optional[dict] = None):
         self.service_account_path = service_account_path
+        # Transporte ya autenticado (p. ej. un httplib2.Http propio o de pruebas) y
+        # opciones del cliente (api_endpoint); sin http se usa la Service Account
+        self.http = http
+        self.client_options = client_options
+        self.folder_path = folder_path  # carpeta destino de connect()/publish()
+        self.session_store_path = session_store_path
+        self.deadline = deadline  # libs.deadline.Deadline opcional para acotar reintentos
+        # Compartido entre subidas: cada archivo parte del ritmo medido en los anteriores
+        self.chunk_sizer = chunk_sizer or AdaptiveChunkSizer()
+        self.upload_stats = {}  # nombre de archivo -> tamaños de fragmento y MB/s de su última subida
         self.service = None
         self._folder_cache = {}
+        self._file_cache = {}
+        self._about = None
     
     def authenticate(self):
         """Autentica usando Service Account (sin intervención del usuario)"""
         try:
-            if not os.path.exists(self.service_account_path):
-                raise FileNotFoundError(f"Archivo de Service Account no encontrado: {self.service_account_path}")
-            
-            # Cargar credenciales desde el archivo JSON
-            creds = Credentials.from_service_account_file(
-                self.service_account_path, scopes=self.SCOPES)
-            
-            # Crear servicio
-            self.service = build('drive', 'v3', credentials=creds)
+            if self.http is not None:
+                self.service = build('drive', 'v3', http=self.http, client_options=self.client_options)
+            else:
+                if not os.path.exists(self.service_account_path):
+                    raise FileNotFoundError(f"Archivo de Service Account no encontrado: {self.service_account_path}")
+                
+                # Cargar credenciales desde el archivo JSON
+                creds = Credentials.from_service_account_file(
+                    self.service_account_path, scopes=self.SCOPES)
+                
+                # Crear servicio
+                self.service = build('drive', 'v3', credentials=creds, client_options=self.client_options)
             
-            # Validar conexión
-            self.service.about().get(fields="user").execute()
-            print("✅ Autenticación con Service Account exitosa")
+            # Validar conexión (se reutiliza en validate_connection/test_connection)
+            self._about = self.service.about().get(fields="user,storageQuota").execute()
+            print(f"✅ Autenticación {'con transporte propio' if self.http is not None else 'con Service Account'} exitosa")
             return self.service
             
         except Exception as e:
             print(f"❌ Error autenticando con Service Account: {e}")
             raise
     
+    def connect(self) -> bool:
+        """Autentica y resuelve la carpeta destino y su contenido en un número constante de consultas"""
+        try:
+            self.authenticate()
+            
+            if not self.validate_connection():
+                print("❌ Error conectando con Google Drive")
+                return False
+            
+            if not self.prefetch_targets([self.folder_path]):
+                print("❌ No se pudo resolver la carpeta destino en Google Drive")
+                return False
+            
+            return True
+        except Exception as e:
+            print(f"❌ Error general conectando con Google Drive: {e}")
+            return False
+    
+    def publish(self, file_path: str, filename: str) -> bool:
+        return self.upload_file(file_path, filename, self.folder_path)
+    
+    def stats(self, filename: str) -> dict:
+        return self.upload_stats.get(filename, {})
+    
     def validate_connection(self) -> bool:
         """Valida que la conexión sea válida"""
         try:
-            if not self.service:
+            if not self.service or self._about is None:
                 self.authenticate()
             
-            self.service.about().get(fields="user,storageQuota").execute()
-            return True
+            return self._about is not None
         except Exception as e:
             print(f"❌ Conexión inválida: {e}")
             return False   
@@ -61,38 +184,74 @@ class DriveManager:
         Si create_if_not_exists=True, crea la carpeta si no existe
         """
         # Usar cache si ya se buscó esta carpeta
-        if folder_path in self._folder_cache:
-            return self._folder_cache[folder_path]
-        
+        if folder_path not in self._folder_cache:
+            self.prefetch_targets([folder_path], create_if_not_exists)
+        return self._folder_cache.get(folder_path)
+    
+    def prefetch_targets(self, folder_paths: list, create_if_not_exists: bool = True) -> bool:
+        """
+        Resuelve los IDs de varias carpetas y de todos sus archivos con un número
+        constante de consultas (una para las carpetas y otra para su contenido).
+        Las búsquedas posteriores de get_folder_id/_get_file_id_in_folder usan el cache.
+        """
         try:
-            # Buscar carpeta en Mi unidad
-            query = f"name='{folder_path}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-            results = self.service.files().list(q=query, fields="files(id, name)").execute()
-            folders = results.get('files', [])
-            
-            if folders:
-                folder_id = folders[0]['id']
-                self._folder_cache[folder_path] = folder_id
-                print(f"📁 Carpeta encontrada: {folder_path}")
-                return folder_id
-            
-            elif create_if_not_exists:
-                # Crear carpeta si no existe
-                folder_metadata = {
-                    'name': folder_path,
-                    'mimeType': 'application/vnd.google-apps.folder'
-                }
-                folder = self.service.files().create(body=folder_metadata, fields='id').execute()
-                folder_id = folder.get('id')
-                self._folder_cache[folder_path] = folder_id
-                print(f"📁 Carpeta creada: {folder_path}")
-                return folder_id
+            # 1. Todas las carpetas pendientes en una sola consulta
+            pending = [path for path in folder_paths if path not in self._folder_cache]
+            if pending:
+                names = " or ".join(f"name='{self._escape_query(path)}'" for path in pending)
+                query = f"mimeType='application/vnd.google-apps.folder' and trashed=false and ({names})"
+                for folder in self._list_all_files(query, "nextPageToken, files(id, name)"):
+                    if folder['name'] in pending and folder['name'] not in self._folder_cache:
+                        self._folder_cache[folder['name']] = folder['id']
+                        print(f"📁 Carpeta encontrada: {folder['name']}")
+                
+                for path in pending:
+                    if path not in self._folder_cache and create_if_not_exists:
+                        # Crear carpeta si no existe
+                        folder_metadata = {
+                            'name': path,
+                            'mimeType': 'application/vnd.google-apps.folder'
+                        }
+                        folder = self.service.files().create(body=folder_metadata, fields='id').execute()
+                        self._folder_cache[path] = folder.get('id')
+                        self._file_cache[folder.get('id')] = {}
+                        print(f"📁 Carpeta creada: {path}")
             
-            return None
+            # 2. Contenido de todas las carpetas en una sola consulta
+            folder_ids = [self._folder_cache[path] for path in folder_paths
+                          if path in self._folder_cache and self._folder_cache[path] not in self._file_cache]
+            if folder_ids:
+                parents = " or ".join(f"'{folder_id}' in parents" for folder_id in folder_ids)
+                query = f"trashed=false and ({parents})"
+                listing = {folder_id: {} for folder_id in folder_ids}
+                for item in self._list_all_files(query, "nextPageToken, files(id, name, parents)"):
+                    for parent in item.get('parents', []):
+                        if parent in listing:
+                            listing[parent].setdefault(item['name'], item['id'])
+                self._file_cache.update(listing)
+            
+            return all(path in self._folder_cache for path in folder_paths)
             
         except HttpError as error:
-            print(f"❌ Error buscando/creando carpeta {folder_path}: {error}")
-            return None
+            print(f"❌ Error buscando/creando carpetas {folder_paths}: {error}")
+            return False
+    
+    def _list_all_files(self, query: str, fields: str) -> list:
+        """Ejecuta files().list recorriendo todas las páginas del resultado"""
+        files = []
+        page_token = None
+        while True:
+            results = self.service.files().list(
+                q=query, fields=fields, pageSize=1000, pageToken=page_token).execute()
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return files
+    
+    @staticmethod
+    def _escape_query(value: str) -> str:
+        """Escapa un valor para usarlo dentro de una consulta de Drive"""
+        return value.replace("\\", "\\\\").replace("'", "\\'")
     
     def upload_json_data(self, data: list, filename: str, folder_path: str) -> bool:
         """
@@ -104,12 +263,6 @@ class DriveManager:
         
         temp_file = None
         try:
-            # Obtener ID de la carpeta
-            folder_id = self.get_folder_id(folder_path)
-            if not folder_id:
-                print(f"❌ No se pudo obtener/crear la carpeta: {folder_path}")
-                return False
-            
             # Crear archivo temporal con nombre único
             temp_file = tempfile.NamedTemporaryFile(
                 mode='w', 
@@ -124,17 +277,64 @@ class DriveManager:
             temp_file.flush()  # Asegurar que se escriban los datos
             temp_file.close()  # Cerrar el archivo para que Windows pueda accederlo
             
+            return self.upload_file(temp_file.name, filename, folder_path)
+                
+        except Exception as e:
+            print(f"❌ Error en upload_json_data: {e}")
+            return False
+        
+        finally:
+            # Limpiar archivo temporal de forma segura
+            if temp_file and os.path.exists(temp_file.name):
+                try:
+                    os.unlink(temp_file.name)  # Eliminar archivo temporal
+                except Exception as cleanup_error:
+                    print(f"⚠️ Advertencia: No se pudo eliminar archivo temporal: {cleanup_error}")
+    
+    def upload_file(self, file_path: str, filename: str, folder_path: str,
+                    mimetype: Optional[str] = None) -> bool:
+        """
+        Sube un archivo local a Google Drive con subida reanudable.
+        Si existe una sesión guardada para el mismo contenido, continúa desde
+        el último byte confirmado en lugar de empezar de cero.
+        Sin mimetype se deduce del formato del archivo (JSON, columnar o MessagePack).
+        Los archivos pequeños (p. ej. version.json) se suben en una sola petición.
+        """
+        try:
+            mimetype = mimetype or mimetype_for(filename)
+            if os.path.getsize(file_path) <= st.UPLOAD_SINGLE_REQUEST_MAX:
+                media = MediaFileUpload(file_path, mimetype=mimetype, resumable=False)
+                return self.upload_media(media, filename, folder_path)
+            
+            # El tamaño de fragmento lo ajusta chunk_sizer durante la subida
+            media = AdaptiveFileUpload(file_path, self.chunk_sizer, mimetype=mimetype)
+            return self.upload_media(media, filename, folder_path,
+                                     content_hash=self._file_sha256(file_path))
+        except Exception as e:
+            print(f"❌ Error en upload_file: {e}")
+            return False
+    
+    def upload_media(self, media, filename: str, folder_path: str,
+                     content_hash: Optional[str] = None) -> bool:
+        """
+        Sube un objeto MediaUpload reanudable a Google Drive.
+        Sin content_hash (p. ej. un archivo que todavía se está generando)
+        la sesión de subida no se guarda en disco.
+        """
+        if not self.service:
+            print("❌ Servicio no autenticado")
+            return False
+        
+        try:
+            # Obtener ID de la carpeta
+            folder_id = self.get_folder_id(folder_path)
+            if not folder_id:
+                print(f"❌ No se pudo obtener/crear la carpeta: {folder_path}")
+                return False
+            
             # Verificar si el archivo ya existe para actualizarlo
             existing_file_id = self._get_file_id_in_folder(filename, folder_id)
             
-            # Preparar metadatos y media
-            media = MediaFileUpload(
-                temp_file.name,  # Usar el nombre del archivo temporal
-                mimetype='application/json',
-                resumable=True,
-                chunksize=1024*1024*8  # 8MB chunks
-            )
-            
             if existing_file_id:
                 # Actualizar archivo existente
                 print(f"🔄 Actualizando archivo existente: {filename}")
@@ -155,10 +355,26 @@ class DriveManager:
                     fields='id'
                 )
             
+            # Retomar sesión previa si el contenido no ha cambiado
+            session_key = f"{folder_id}/{filename}" if content_hash else None
+            session = self._get_upload_session(session_key, content_hash) if session_key else None
+            if session:
+                print(f"♻️ Retomando subida de {filename} desde el byte {session['offset']}")
+                request.resumable_uri = session['uri']
+                request.resumable_progress = session['offset']
+                # Fuerza a la librería a consultar el estado real de la sesión
+                # antes de enviar el siguiente fragmento. _in_error_state es un atributo
+                # privado de HttpRequest en google-api-python-client==2.88.0 (versión fijada
+                # en requirements.txt); revisar este punto al actualizar la librería
+                request._in_error_state = True
+            
             # Ejecutar upload con retry y progress
-            response = self._execute_upload_with_retry(request, filename)
+            response = self._execute_upload_with_retry(
+                request, filename, session_key=session_key, content_hash=content_hash)
             
             if response:
+                if folder_id in self._file_cache and response.get('id'):
+                    self._file_cache[folder_id][filename] = response['id']
                 print(f"✅ Archivo {filename} subido exitosamente a {folder_path}")
                 return True
             else:
@@ -166,67 +382,203 @@ class DriveManager:
                 return False
                 
         except Exception as e:
-            print(f"❌ Error en upload_json_data: {e}")
+            print(f"❌ Error en upload_media: {e}")
             return False
-        
-        finally:
-            # Limpiar archivo temporal de forma segura
-            if temp_file and os.path.exists(temp_file.name):
-                try:
-                    os.unlink(temp_file.name)  # Eliminar archivo temporal
-                except Exception as cleanup_error:
-                    print(f"⚠️ Advertencia: No se pudo eliminar archivo temporal: {cleanup_error}")
     
     def _get_file_id_in_folder(self, filename: str, folder_id: str) -> Optional[str]:
         """Busca un archivo por nombre dentro de una carpeta específica"""
+        if folder_id in self._file_cache:
+            return self._file_cache[folder_id].get(filename)
         try:
-            query = f"name='{filename}' and '{folder_id}' in parents and trashed=false"
+            query = f"name='{self._escape_query(filename)}' and '{folder_id}' in parents and trashed=false"
             results = self.service.files().list(q=query, fields="files(id, name)").execute()
             files = results.get('files', [])
             return files[0]['id'] if files else None
         except HttpError:
             return None
     
-    def _execute_upload_with_retry(self, request, filename: str, max_retries: int = 3):
-        """Ejecuta upload con reintentos y manejo de progreso"""
+    def _execute_upload_with_retry(self, request, filename: str, max_retries: int = 3,
+                                   session_key: Optional[str] = None,
+                                   content_hash: Optional[str] = None):
+        """
+        Ejecuta upload con reintentos y manejo de progreso. En archivos de tamaño
+        conocido mide cada fragmento y ajusta el tamaño del siguiente; la
+        subida de un archivo en generación usa un tamaño fijo, porque su tiempo
+        incluye la espera al productor.
+        """
+        media = request.resumable
+        adaptive = isinstance(media, AdaptiveFileUpload)
+        chunks = []  # (bytes, segundos) de cada petición con datos
+        
         for attempt in range(max_retries):
+            if self.deadline and self.deadline.expired():
+                print(f"⏰ Sin tiempo restante para subir {filename}")
+                break
             try:
+                if media is None:
+                    # Subida simple: metadatos y contenido en una sola petición
+                    started = time.monotonic()
+                    response = request.execute()
+                    chunks.append((request.body_size, time.monotonic() - started))
+                    self._record_upload_stats(filename, chunks)
+                    return response
+                
                 response = None
                 while response is None:
-                    status, response = request.next_chunk()
+                    offset = request.resumable_progress
+                    started = time.monotonic()
+                    try:
+                        status, response = request.next_chunk()
+                    except Exception:
+                        if adaptive:
+                            self.chunk_sizer.record_failure()
+                        raise
+                    elapsed = time.monotonic() - started
+                    sent = (media.size() if response is not None else request.resumable_progress) - offset
+                    if sent > 0:
+                        chunks.append((sent, elapsed))
+                        if adaptive:
+                            self.chunk_sizer.record(sent, elapsed)
                     if status:
-                        progress = int(status.progress() * 100)
-                        print(f"📊 Progreso {filename}: {progress}%")
+                        if status.total_size:
+                            progress = int(status.progress() * 100)
+                            print(f"📊 Progreso {filename}: {progress}%")
+                        else:
+                            # Tamaño aún desconocido (archivo en generación)
+                            print(f"📊 Progreso {filename}: {status.resumable_progress / (1024 * 1024):.1f} MB")
+                        if session_key and request.resumable_uri:
+                            self._save_upload_session(session_key, request, content_hash)
                 
+                if session_key:
+                    self._clear_upload_session(session_key)
+                self._record_upload_stats(filename, chunks)
                 return response
                 
             except HttpError as error:
-                if error.resp.status == 429:  # Rate limit
+                if error.resp.status in (404, 410) and request.resumable_uri:
+                    # Sesión caducada o desconocida: empezar una nueva
+                    print(f"⚠️ Sesión de subida expirada para {filename}. Iniciando nueva sesión...")
+                    if session_key:
+                        self._clear_upload_session(session_key)
+                    request.resumable_uri = None
+                    request.resumable_progress = 0
+                    request._in_error_state = False  # privado; ver upload_media
+                elif error.resp.status == 429:  # Rate limit
                     wait_time = (2 ** attempt) + 1
-                    print(f"⏳ Rate limit alcanzado. Esperando {wait_time}s...")
-                    time.sleep(wait_time)
+                    if not self._wait_before_retry(wait_time, f"⏳ Rate limit alcanzado. Esperando {wait_time}s..."):
+                        break
                 elif error.resp.status >= 500:  # Server errors
                     wait_time = (2 ** attempt) + 1
-                    print(f"⏳ Error servidor. Reintentando en {wait_time}s...")
-                    time.sleep(wait_time)
+                    if not self._wait_before_retry(wait_time, f"⏳ Error servidor. Reintentando en {wait_time}s..."):
+                        break
                 else:
                     print(f"❌ Error HTTP: {error}")
+                    if session_key:
+                        self._clear_upload_session(session_key)
                     break
+            except SourceAborted as e:
+                print(f"❌ Subida de {filename} cancelada: {e}")
+                break
             except Exception as e:
                 print(f"❌ Error en intento {attempt + 1}: {e}")
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                    if not self._wait_before_retry(2 ** attempt):
+                        break
         
         return None
     
+    def _record_upload_stats(self, filename: str, chunks: list):
+        """Registra los tamaños de fragmento usados y el rendimiento obtenido en la subida"""
+        total_bytes = sum(size for size, _ in chunks)
+        total_seconds = sum(seconds for _, seconds in chunks)
+        mb_per_s = total_bytes / (1024 * 1024) / total_seconds if total_seconds else 0.0
+        latency = self.chunk_sizer.latency()
+        self.upload_stats[filename] = {
+            'requests': len(chunks),
+            'chunk_sizes_mb': [round(size / (1024 * 1024), 2) for size, _ in chunks],
+            'mb': round(total_bytes / (1024 * 1024), 2),
+            'seconds': round(total_seconds, 2),
+            'mb_per_s': round(mb_per_s, 2),
+            'latency_s': round(latency, 3) if latency is not None else None
+        }
+        print(f"⚡ {filename}: {total_bytes / (1024 * 1024):.1f} MB en {len(chunks)} petición(es), "
+              f"{mb_per_s:.2f} MB/s")
+    
+    def _wait_before_retry(self, wait_time: float, message: Optional[str] = None) -> bool:
+        """Espera antes de reintentar si el tiempo límite lo permite"""
+        if self.deadline and not self.deadline.allows_wait(wait_time):
+            print(f"⏰ Reintento cancelado: la espera de {wait_time}s excede el tiempo restante")
+            return False
+        if message:
+            print(message)
+        time.sleep(wait_time)
+        return True
+    
+    def _file_sha256(self, file_path: str) -> str:
+        """Calcula el hash del contenido para asociar la sesión al archivo exacto"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load_upload_sessions(self) -> dict:
+        """Carga las sesiones de subida guardadas en disco"""
+        return read_json(self.session_store_path, default={})
+    
+    def _write_upload_sessions(self, sessions: dict):
+        """Guarda las sesiones de forma atómica para sobrevivir a un cierre del proceso"""
+        write_json_atomic(self.session_store_path, sessions)
+    
+    def _get_upload_session(self, session_key: str, content_hash: str) -> Optional[dict]:
+        """Devuelve la sesión guardada si corresponde al mismo contenido y no ha expirado"""
+        session = self._load_upload_sessions().get(session_key)
+        if not session:
+            return None
+        
+        if session.get('content_hash') != content_hash:
+            self._clear_upload_session(session_key)
+            return None
+        
+        if time.time() - session.get('created_at', 0) > st.UPLOAD_SESSION_MAX_AGE:
+            print(f"⚠️ Sesión de subida caducada descartada: {session_key}")
+            self._clear_upload_session(session_key)
+            return None
+        
+        return session
+    
+    def _save_upload_session(self, session_key: str, request, content_hash: str):
+        """Registra la URI de la sesión y el último byte confirmado por el servidor"""
+        try:
+            sessions = self._load_upload_sessions()
+            previous = sessions.get(session_key, {})
+            if previous.get('uri') != request.resumable_uri:
+                previous = {'created_at': time.time()}
+            sessions[session_key] = {
+                'uri': request.resumable_uri,
+                'offset': request.resumable_progress,
+                'content_hash': content_hash,
+                'created_at': previous['created_at'],
+            }
+            self._write_upload_sessions(sessions)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la sesión de subida: {e}")
+    
+    def _clear_upload_session(self, session_key: str):
+        """Elimina la sesión guardada una vez completada o invalidada"""
+        sessions = self._load_upload_sessions()
+        if sessions.pop(session_key, None) is not None:
+            try:
+                self._write_upload_sessions(sessions)
+            except OSError as e:
+                print(f"⚠️ No se pudo actualizar las sesiones de subida: {e}")
+    
     def test_connection(self) -> bool:
         """Prueba la conexión con Google Drive"""
         try:
-            if not self.service:
+            if not self.service or self._about is None:
                 self.authenticate()
             
-            # Hacer una consulta simple
-            results = self.service.files().list(pageSize=1).execute()
             print("✅ Conexión con Google Drive exitosa")
             return True
             
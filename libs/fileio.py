@@ -0,0 +1,127 @@
+import os
+import json
+from json.decoder import JSONDecodeError
+
+def write_json_atomic(path: str, data, indent: int = 2):
+    """
+    Escribe un JSON de forma atómica: primero en un archivo temporal junto al
+    destino y después lo renombra, de modo que nunca queda un archivo a medias
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def read_json(path: str, default=None):
+    """Lee un JSON; devuelve default si no existe o está corrupto"""
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+            return json.loads(content) if content else default
+    except (JSONDecodeError, OSError) as e:
+        print(f"Error leyendo {path}: {e}")
+        return default
+
+def dataframe_to_records(df) -> list:
+    """
+    Convierte un DataFrame en una lista de dicts con tipos nativos de Python,
+    igual que df.to_dict(orient='records') pero varias veces más rápido:
+    convierte cada columna de una vez con tolist() en lugar de celda a celda
+    """
+    columns = list(df.columns)
+    return [dict(zip(columns, row)) for row in zip(*(df[column].tolist() for column in columns))]
+
+def iter_json_array(path: str, block_size: int = 1024 * 1024):
+    """
+    Recorre los elementos de un array JSON leyendo el archivo por bloques,
+    sin cargarlo completo en memoria
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, pos, eof = '', 0, False
+        state = 'start'  # start -> first -> (value -> after)* -> end
+        
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            
+            if pos >= len(buffer) and not eof:
+                block = f.read(block_size)
+                buffer, pos, eof = buffer[pos:] + block, 0, not block
+                continue
+            
+            if pos >= len(buffer):
+                if state == 'start':
+                    return  # archivo vacío
+                raise ValueError(f"Array JSON incompleto en {path}")
+            
+            char = buffer[pos]
+            if state == 'start':
+                if char != '[':
+                    raise ValueError(f"{path} no contiene un array JSON")
+                pos, state = pos + 1, 'first'
+            elif state == 'after' or (state == 'first' and char == ']'):
+                if char == ']':
+                    return
+                if char != ',':
+                    raise ValueError(f"Separador inesperado '{char}' en {path}")
+                pos, state = pos + 1, 'value'
+            else:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except JSONDecodeError:
+                    end = None
+                # Un valor que llega justo al final del bloque puede estar truncado
+                if end is None or (end == len(buffer) and not eof):
+                    if eof:
+                        raise ValueError(f"Elemento JSON inválido en {path}")
+                    block = f.read(block_size)
+                    buffer, pos, eof = buffer[pos:] + block, 0, not block
+                    continue
+                yield value
+                pos, state = end, 'after'
+            
+            # Descartar lo ya procesado para que el buffer no crezca
+            if pos > block_size:
+                buffer, pos = buffer[pos:], 0
+
+class JsonArrayWriter:
+    """
+    Escribe un array JSON por bloques de registros con el mismo formato que
+    json.dump(indent=2), sin necesidad de tener todos los registros en memoria
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+    
+    def write_records(self, records):
+        for record in records:
+            text = json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+            self._file.write(('[\n  ' if self.count == 0 else ',\n  ') + text)
+            self.count += 1
+        # Hacer visibles los bytes escritos a quien lee el archivo mientras crece
+        self._file.flush()
+    
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write('\n]' if self.count else '[]')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
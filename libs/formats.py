@@ -0,0 +1,147 @@
+"""
+Formatos alternativos de los artefactos de artículos.
+
+Ambos formatos usan la misma estructura orientada a columnas, que evita repetir
+los nombres de los campos en cada registro y saca a la cabecera los campos con
+el mismo valor en todos los registros (p. ej. ultima_actualizacion):
+
+    {
+        "format": "columnar",
+        "count": 2,
+        "constants": {"ultima_actualizacion": 1700000000000},
+        "columns": ["referencia", "stock_actual"],
+        "values": [["A1", "B2"], [10, 0]]
+    }
+
+- 'columnar': la estructura anterior como JSON compacto
+- 'msgpack': la misma estructura serializada con MessagePack
+
+Para reconstruir el registro i: {columns[j]: values[j][i]} más los campos de constants.
+"""
+import os
+import json
+import shutil
+import tempfile
+from libs.fileio import iter_json_array
+
+try:
+    import msgpack
+except ImportError:  # dependencia opcional
+    msgpack = None
+
+FORMATS = {
+    'columnar': {'suffix': '.columnar.json', 'mimetype': 'application/json'},
+    'msgpack': {'suffix': '.msgpack', 'mimetype': 'application/x-msgpack'},
+}
+
+def format_available(fmt: str) -> bool:
+    return fmt in FORMATS and (fmt != 'msgpack' or msgpack is not None)
+
+def artifact_filename(filename: str, fmt: str) -> str:
+    """Nombre del artefacto en el formato indicado: last_full_data.json -> last_full_data.msgpack"""
+    base, _ = os.path.splitext(filename)
+    return base + FORMATS[fmt]['suffix']
+
+# Otros artefactos publicados junto a los datos
+OTHER_MIMETYPES = {
+    '.sqlite': 'application/vnd.sqlite3',
+}
+
+def mimetype_for(filename: str) -> str:
+    for spec in FORMATS.values():
+        if filename.endswith(spec['suffix']):
+            return spec['mimetype']
+    return OTHER_MIMETYPES.get(os.path.splitext(filename)[1], 'application/json')
+
+class _ColumnBuffer:
+    """Valores de una columna escritos a un archivo temporal mientras se recorre el origen"""
+    
+    def __init__(self, directory: str, index: int, fmt: str):
+        self.path = os.path.join(directory, f"col_{index}")
+        self.fmt = fmt
+        self.count = 0
+        self.first = None
+        self.constant = True
+        self._file = open(self.path, 'wb')
+        self._packer = msgpack.Packer(use_bin_type=True) if fmt == 'msgpack' else None
+    
+    def add(self, value):
+        if self.count == 0:
+            self.first = value
+        elif self.constant and value != self.first:
+            self.constant = False
+        
+        if self._packer:
+            self._file.write(self._packer.pack(value))
+        else:
+            prefix = b',' if self.count else b''
+            self._file.write(prefix + json.dumps(value, ensure_ascii=False).encode('utf-8'))
+        self.count += 1
+    
+    def close(self):
+        self._file.close()
+
+def convert_json_artifact(source_path: str, fmt: str, output_path: str) -> int:
+    """
+    Convierte un artefacto JSON (array de objetos) al formato indicado leyendo el
+    origen una sola vez y con memoria acotada. Retorna el número de registros.
+    """
+    if not format_available(fmt):
+        raise ValueError(f"Formato no disponible: {fmt}")
+    
+    work_dir = tempfile.mkdtemp(prefix='dbtojson_columns_')
+    columns = {}
+    try:
+        count = 0
+        for record in iter_json_array(source_path):
+            for key, value in record.items():
+                if key not in columns:
+                    columns[key] = _ColumnBuffer(work_dir, len(columns), fmt)
+                columns[key].add(value)
+            count += 1
+        for buffer in columns.values():
+            buffer.close()
+            if buffer.count != count:
+                # Un campo ausente en algunos registros no puede ir en una columna densa
+                raise ValueError(f"El campo no está en todos los registros de {source_path}")
+        
+        # Un único registro no justifica una cabecera de constantes
+        constants = {key: buffer.first for key, buffer in columns.items() if buffer.constant and count > 1}
+        value_columns = [key for key in columns if key not in constants]
+        
+        temp_output = f"{output_path}.tmp"
+        with open(temp_output, 'wb') as out:
+            if fmt == 'msgpack':
+                packer = msgpack.Packer(use_bin_type=True)
+                out.write(packer.pack_map_header(5))
+                for key, value in (('format', 'columnar'), ('count', count),
+                                   ('constants', constants), ('columns', value_columns)):
+                    out.write(packer.pack(key))
+                    out.write(packer.pack(value))
+                out.write(packer.pack('values'))
+                out.write(packer.pack_array_header(len(value_columns)))
+                for key in value_columns:
+                    out.write(packer.pack_array_header(count))
+                    with open(columns[key].path, 'rb') as column_file:
+                        shutil.copyfileobj(column_file, out)
+            else:
+                header = json.dumps({
+                    'format': 'columnar',
+                    'count': count,
+                    'constants': constants,
+                    'columns': value_columns
+                }, ensure_ascii=False)
+                out.write(header[:-1].encode('utf-8') + b', "values": [')
+                for index, key in enumerate(value_columns):
+                    out.write(b',[' if index else b'[')
+                    with open(columns[key].path, 'rb') as column_file:
+                        shutil.copyfileobj(column_file, out)
+                    out.write(b']')
+                out.write(b']}')
+        os.replace(temp_output, output_path)
+        return count
+    
+    finally:
+        for buffer in columns.values():
+            buffer.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
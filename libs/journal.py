@@ -0,0 +1,72 @@
+import time
+import threading
+from datetime import datetime
+from typing import Optional
+import config.setting as st
+from libs.fileio import write_json_atomic, read_json
+
+class RunJournal:
+    """
+    Diario de la ejecución en output/: registra cada etapa completada para que
+    un reintento de una ejecución fallida continúe desde la etapa que falló
+    """
+    
+    def __init__(self, path: str = st.runJournalFile, max_age: float = st.RUN_JOURNAL_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.data = None
+        self._lock = threading.Lock()  # las subidas en segundo plano también registran etapas
+    
+    def start(self, resume: bool = True) -> bool:
+        """
+        Carga el diario de una ejecución anterior no completada o inicia uno nuevo
+        (siempre uno nuevo si resume es False). Retorna True si se retoma una
+        ejecución anterior.
+        """
+        previous = read_json(self.path) if resume else None
+        if (previous
+                and previous.get('status') != 'completed'
+                and time.time() - previous.get('started_at', 0) <= self.max_age):
+            self.data = previous
+            self.data['status'] = 'running'
+            self.data['attempts'] = self.data.get('attempts', 1) + 1
+            self._save()
+            return True
+        
+        now = datetime.now()
+        self.data = {
+            'run_id': now.strftime("%Y%m%d%H%M%S"),
+            'started_at': time.time(),
+            'status': 'running',
+            'attempts': 1,
+            'stages': {}
+        }
+        self._save()
+        return False
+    
+    @property
+    def run_id(self) -> str:
+        return self.data['run_id']
+    
+    def is_done(self, stage: str) -> bool:
+        return stage in self.data['stages']
+    
+    def get(self, stage: str) -> Optional[dict]:
+        """Información registrada al completar la etapa"""
+        return self.data['stages'].get(stage)
+    
+    def mark_done(self, stage: str, **info):
+        """Registra una etapa como completada junto con su información asociada"""
+        with self._lock:
+            self.data['stages'][stage] = {'completed_at': datetime.now().isoformat(), **info}
+            self._save()
+    
+    def finish(self, status: str = 'completed'):
+        """Cierra el diario con el estado final ('completed' o 'failed')"""
+        with self._lock:
+            self.data['status'] = status
+            self.data['finished_at'] = datetime.now().isoformat()
+            self._save()
+    
+    def _save(self):
+        write_json_atomic(self.path, self.data)
@@ -0,0 +1,74 @@
+import os
+import sys
+from typing import Optional
+import config.setting as st
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Un registro JSON cargado como dict de Python ocupa varias veces su tamaño en disco
+JSON_MEMORY_FACTOR = 4
+
+def data_budget_mb() -> Optional[float]:
+    """Memoria disponible para datos antes de pasar a procesamiento en disco"""
+    if st.MEMORY_BUDGET_MB is None:
+        return None
+    return st.MEMORY_BUDGET_MB * st.SPILL_DATA_RATIO
+
+def estimate_json_memory_mb(path: str) -> float:
+    """Estimación de la memoria necesaria para cargar un archivo JSON completo"""
+    if not os.path.exists(path):
+        return 0.0
+    return os.path.getsize(path) * JSON_MEMORY_FACTOR / (1024 * 1024)
+
+def exceeds_data_budget(estimated_mb: float) -> bool:
+    budget = data_budget_mb()
+    return budget is not None and estimated_mb > budget
+
+def peak_rss_mb() -> Optional[float]:
+    """Memoria residente máxima del proceso en MB (None si la plataforma no la expone)"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo reporta en KB y macOS en bytes
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+        
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t)
+            ]
+        
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        if ctypes.windll.psapi.GetProcessMemoryInfo(
+                kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize / (1024 * 1024)
+    
+    return None
+
+def report_peak_memory():
+    """Muestra la memoria pico del proceso frente al presupuesto configurado"""
+    peak = peak_rss_mb()
+    if peak is None:
+        print("🧠 Memoria pico: no disponible en esta plataforma")
+    elif st.MEMORY_BUDGET_MB is None:
+        print(f"🧠 Memoria pico: {peak:.0f} MB (sin presupuesto configurado)")
+    else:
+        status = "✅" if peak <= st.MEMORY_BUDGET_MB else "⚠️"
+        print(f"🧠 Memoria pico: {peak:.0f} MB de {st.MEMORY_BUDGET_MB} MB presupuestados {status}")
@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+class MultiSinkPublisher:
+    """
+    Publica cada archivo en todos los destinos a la vez y mide la latencia y el
+    resultado en cada uno. Un destino que no pudo conectarse cuenta como fallido
+    en todas las publicaciones.
+    """
+    
+    def __init__(self, sinks: list):
+        self.sinks = sinks
+        self.connected = {}  # clave del destino -> conectado
+    
+    def connect(self) -> bool:
+        """Conecta todos los destinos en paralelo; retorna True si al menos uno está disponible"""
+        if not self.sinks:
+            return False
+        with ThreadPoolExecutor(max_workers=len(self.sinks), thread_name_prefix='sink_connect') as executor:
+            results = executor.map(self._connect_sink, self.sinks)
+            self.connected = dict(zip((sink.key for sink in self.sinks), results))
+        
+        for sink in self.sinks:
+            status = "✅ conectado" if self.connected[sink.key] else "❌ no disponible"
+            print(f"🔌 {sink.name}: {status}")
+        return any(self.connected.values())
+    
+    def publish(self, file_path: str, filename: str, sink_keys: Optional[list] = None) -> dict:
+        """
+        Publica el archivo en los destinos indicados (todos si sink_keys es None).
+        Retorna {clave del destino: {'success': bool, 'seconds': float, ...}} con las
+        métricas adicionales que aporte cada destino.
+        """
+        sinks = [sink for sink in self.sinks if sink_keys is None or sink.key in sink_keys]
+        if not sinks:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=len(sinks), thread_name_prefix='sink_publish') as executor:
+            futures = {sink.key: executor.submit(self._publish_to_sink, sink, file_path, filename)
+                       for sink in sinks}
+            results = {key: future.result() for key, future in futures.items()}
+        
+        for sink in sinks:
+            result = results[sink.key]
+            status = "✅" if result['success'] else "❌"
+            print(f"   {status} {filename} → {sink.name}: {result['seconds']:.2f}s")
+        return results
+    
+    def sink(self, key: str):
+        """Destino con esa clave o None si no está configurado"""
+        return next((sink for sink in self.sinks if sink.key == key), None)
+    
+    def sink_name(self, key: str) -> str:
+        sink = self.sink(key)
+        return sink.name if sink else key
+    
+    def _connect_sink(self, sink) -> bool:
+        try:
+            return bool(sink.connect())
+        except Exception as e:
+            print(f"❌ Error conectando con {sink.name}: {e}")
+            return False
+    
+    def _publish_to_sink(self, sink, file_path: str, filename: str) -> dict:
+        started = time.monotonic()
+        if not self.connected.get(sink.key):
+            return {'success': False, 'seconds': 0.0}
+        try:
+            success = bool(sink.publish(file_path, filename))
+        except Exception as e:
+            print(f"❌ Error publicando {filename} en {sink.name}: {e}")
+            success = False
+        seconds = round(time.monotonic() - started, 3)
+        details = sink.stats(filename) if success else {}
+        return {**details, 'success': success, 'seconds': seconds}
@@ -0,0 +1,152 @@
+import os
+import json
+import sys
+import time
+import uuid
+from typing import Optional
+import config.setting as st
+from libs.fileio import read_json
+
+def process_alive(pid: int) -> bool:
+    """Indica si existe un proceso con ese PID"""
+    if pid <= 0:
+        return False
+    
+    if sys.platform == 'win32':
+        # En Windows os.kill(pid, 0) termina el proceso: se consulta con la API
+        import ctypes
+        from ctypes import wintypes
+        
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        ERROR_ACCESS_DENIED = 5
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # Sin permisos para abrirlo el proceso existe igualmente
+            return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+        try:
+            exit_code = wintypes.DWORD()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class RunLock:
+    """
+    Bloqueo de ejecución única en output/: el archivo de bloqueo guarda el PID del
+    proceso que lo tiene. Una ejecución que lo encuentra ocupado deja una marca de
+    ejecución pendiente, que el proceso en curso atiende con un ciclo adicional.
+    Cada marca es un archivo propio en pending_dir: varias ejecuciones simultáneas
+    nunca escriben el mismo archivo y cada marca la consume un solo proceso.
+    """
+    
+    def __init__(self, path: str = st.runLockFile, pending_dir: str = st.runPendingDir,
+                 max_age: float = st.RUN_LOCK_MAX_AGE):
+        self.path = path
+        self.pending_dir = pending_dir
+        self.max_age = max_age
+        self.acquired = False
+    
+    def acquire(self) -> bool:
+        """Intenta tomar el bloqueo; si hay uno obsoleto lo sustituye. Retorna True si lo obtiene."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self.holder()
+                if not self._is_stale(holder):
+                    return False
+                self._remove_stale(holder)
+                continue
+            
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'started_at': time.time()}, f)
+            self.acquired = True
+            return True
+        
+        return False
+    
+    def holder(self) -> Optional[dict]:
+        """Contenido del bloqueo actual (PID y hora de inicio) o None si no es legible"""
+        return read_json(self.path)
+    
+    def release(self):
+        """Libera el bloqueo si pertenece a este proceso"""
+        if not self.acquired:
+            return
+        holder = self.holder()
+        if holder and holder.get('pid') == os.getpid():
+            os.remove(self.path)
+        self.acquired = False
+    
+    def request_followup(self):
+        """Deja constancia de que se solicitó una ejecución mientras había otra en curso"""
+        os.makedirs(self.pending_dir, exist_ok=True)
+        name = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.request"
+        os.close(os.open(os.path.join(self.pending_dir, name), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    
+    def has_pending(self) -> bool:
+        return bool(self._pending_requests())
+    
+    def take_pending(self) -> int:
+        """
+        Consume las marcas de ejecución pendiente; retorna cuántas solicitudes había.
+        Eliminar la marca es lo que la consume: una marca que otro proceso eliminó
+        antes no se cuenta, y una creada después queda para la siguiente comprobación.
+        """
+        taken = 0
+        for name in self._pending_requests():
+            try:
+                os.remove(os.path.join(self.pending_dir, name))
+                taken += 1
+            except FileNotFoundError:
+                pass  # la consumió otro proceso
+            except PermissionError:
+                pass  # en Windows, aún abierta por quien la crea: se atiende después
+        return taken
+    
+    def _pending_requests(self) -> list:
+        try:
+            return [name for name in os.listdir(self.pending_dir) if name.endswith('.request')]
+        except FileNotFoundError:
+            return []
+    
+    def _is_stale(self, holder: Optional[dict]) -> bool:
+        """
+        Un bloqueo es obsoleto si su proceso ya no existe o si supera la antigüedad
+        máxima (protege frente a PIDs reutilizados por el sistema). Un bloqueo
+        ilegible solo se considera obsoleto pasado un momento, porque puede estar
+        escribiéndose.
+        """
+        if holder is None:
+            try:
+                age = time.time() - os.path.getmtime(self.path)
+            except FileNotFoundError:
+                return True
+            return age > 5
+        
+        if time.time() - holder.get('started_at', 0) > self.max_age:
+            return True
+        return not process_alive(int(holder.get('pid', 0)))
+    
+    def _remove_stale(self, holder: Optional[dict]):
+        """Elimina el bloqueo obsoleto salvo que otro proceso lo haya renovado entretanto"""
+        if self.holder() != holder:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,135 @@
+import os
+import shutil
+from abc import ABC, abstractmethod
+from typing import Optional
+from libs.formats import mimetype_for
+
+try:
+    import boto3
+    from boto3.exceptions import S3UploadFailedError
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # dependencia opcional
+    boto3 = None
+
+class Sink(ABC):
+    """
+    Destino de publicación de los archivos generados. Cada implementación
+    reemplaza el archivo completo de forma atómica, de modo que los clientes
+    ven la versión anterior o la nueva, nunca una a medias.
+    """
+    
+    key = None  # identificador usado en el diario de ejecución
+    name = None  # nombre mostrado en los informes
+    
+    def connect(self) -> bool:
+        """Prepara el destino; retorna False si no está disponible"""
+        return True
+    
+    @abstractmethod
+    def publish(self, file_path: str, filename: str) -> bool:
+        """Publica el archivo local file_path con el nombre filename"""
+    
+    def stats(self, filename: str) -> dict:
+        """Métricas adicionales de la última publicación del archivo"""
+        return {}
+
+class LocalDirectorySink(Sink):
+    """Copia los archivos a un directorio local o de red (p. ej. una unidad mapeada)"""
+    
+    key = 'local'
+    
+    def __init__(self, directory: str, name: str = "Carpeta compartida"):
+        self.directory = directory
+        self.name = name
+    
+    def connect(self) -> bool:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            return True
+        except OSError as e:
+            print(f"❌ {self.name} no disponible ({self.directory}): {e}")
+            return False
+    
+    def publish(self, file_path: str, filename: str) -> bool:
+        target = os.path.join(self.directory, filename)
+        temp_target = f"{target}.tmp"
+        try:
+            shutil.copyfile(file_path, temp_target)
+            os.replace(temp_target, target)
+            return True
+        except OSError as e:
+            print(f"❌ Error copiando {filename} a {self.directory}: {e}")
+            if os.path.exists(temp_target):
+                os.remove(temp_target)
+            return False
+
+class S3Sink(Sink):
+    """
+    Sube los archivos a un bucket compatible con S3 (AWS, MinIO...). El bucket
+    debe existir; con create_bucket se crea si falta (p. ej. un MinIO local).
+    """
+    
+    key = 's3'
+    
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, prefix: str = '',
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 region: Optional[str] = None, create_bucket: bool = False):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.prefix = prefix.strip('/')
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.create_bucket = create_bucket
+        self.name = f"S3 ({bucket})"
+        self.client = None
+    
+    def connect(self) -> bool:
+        if boto3 is None:
+            print(f"⚠️ {self.name} no disponible: falta la dependencia boto3")
+            return False
+        
+        try:
+            self.client = boto3.client(
+                's3',
+                endpoint_url=self.endpoint_url,
+                aws_access_key_id=self.access_key,
+                aws_secret_access_key=self.secret_key,
+                region_name=self.region,
+                config=Config(retries={'max_attempts': 3, 'mode': 'standard'})
+            )
+            try:
+                self.client.head_bucket(Bucket=self.bucket)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchBucket'):
+                    raise
+                if not self.create_bucket:
+                    print(f"❌ {self.name}: el bucket no existe (¿S3_BUCKET mal escrito?)")
+                    return False
+                # Fuera de us-east-1, AWS exige indicar la región del bucket nuevo
+                options = {}
+                if self.region and self.region != 'us-east-1':
+                    options['CreateBucketConfiguration'] = {'LocationConstraint': self.region}
+                self.client.create_bucket(Bucket=self.bucket, **options)
+                print(f"🪣 Bucket creado: {self.bucket}")
+            return True
+        except (BotoCoreError, ClientError) as e:
+            print(f"❌ Error conectando con {self.name}: {e}")
+            return False
+    
+    def publish(self, file_path: str, filename: str) -> bool:
+        object_key = f"{self.prefix}/{filename}" if self.prefix else filename
+        try:
+            # Los archivos grandes se suben en partes; el objeto solo se reemplaza al completar
+            self.client.upload_file(
+                file_path, self.bucket, object_key,
+                ExtraArgs={'ContentType': mimetype_for(filename)},
+                Config=TransferConfig(multipart_threshold=8 * 1024 * 1024,
+                                      multipart_chunksize=8 * 1024 * 1024)
+            )
+            return True
+        except (BotoCoreError, ClientError, S3UploadFailedError) as e:
+            print(f"❌ Error subiendo {filename} a {self.name}: {e}")
+            return False
@@ -0,0 +1,133 @@
+import os
+import json
+import sqlite3
+import tempfile
+from typing import Optional
+import pandas as pd
+from libs.fileio import iter_json_array, JsonArrayWriter
+
+def _open_spill_database(prefix: str):
+    """Crea una base SQLite temporal; los datos son desechables, así que se omite el journaling"""
+    fd, db_path = tempfile.mkstemp(prefix=prefix, suffix='.sqlite')
+    os.close(fd)
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=OFF")
+    connection.execute("PRAGMA synchronous=OFF")
+    return db_path, connection
+
+class RecordStore:
+    """
+    Almacena los bloques limpios de una consulta en memoria mientras caben en el
+    presupuesto y los vuelca a un archivo SQLite temporal en cuanto lo superan
+    """
+    
+    def __init__(self, budget_mb: Optional[float], read_chunksize: int = 50000):
+        self.budget_bytes = None if budget_mb is None else budget_mb * 1024 * 1024
+        self.read_chunksize = read_chunksize
+        self._chunks = []
+        self._memory_bytes = 0
+        self._rows = 0
+        self._db_path = None
+        self._connection = None
+    
+    @property
+    def spilled(self) -> bool:
+        return self._connection is not None
+    
+    def __len__(self):
+        return self._rows
+    
+    def append(self, df: pd.DataFrame):
+        """Añade un bloque; si se supera el presupuesto todo pasa a disco"""
+        if df.empty:
+            return
+        self._rows += len(df)
+        
+        if self.spilled:
+            self._write(df)
+            return
+        
+        self._chunks.append(df)
+        self._memory_bytes += int(df.memory_usage(deep=True).sum())
+        if self.budget_bytes is not None and self._memory_bytes > self.budget_bytes:
+            self._spill()
+    
+    def iter_chunks(self):
+        """Recorre los datos por bloques en el orden en que se añadieron"""
+        if not self.spilled:
+            yield from self._chunks
+            return
+        yield from pd.read_sql_query(
+            "SELECT * FROM records ORDER BY rowid", self._connection, chunksize=self.read_chunksize)
+    
+    def _spill(self):
+        print(f"💽 Datos en memoria ({self._memory_bytes / (1024 * 1024):.0f} MB) superan el presupuesto: "
+              f"continuando en disco")
+        self._db_path, self._connection = _open_spill_database('dbtojson_records_')
+        for chunk in self._chunks:
+            self._write(chunk)
+        self._chunks = []
+        self._memory_bytes = 0
+    
+    def _write(self, df: pd.DataFrame):
+        df.to_sql('records', self._connection, if_exists='append', index=False)
+        self._connection.commit()
+    
+    def close(self):
+        """Libera la memoria y elimina el archivo temporal si se usó"""
+        self._chunks = []
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if self._db_path and os.path.exists(self._db_path):
+            os.remove(self._db_path)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def merge_changes_on_disk(existing_path: str, new_changes: list, output_path: str,
+                          key: str = 'referencia', batch_size: int = 10000) -> int:
+    """
+    Fusiona por clave los cambios existentes con los nuevos usando una tabla
+    SQLite temporal, con el mismo resultado que concat + drop_duplicates(keep='last'):
+    cada clave conserva su último cambio, en la posición de ese último cambio.
+    Escribe el resultado en output_path por bloques y retorna el número de registros.
+    """
+    db_path, connection = _open_spill_database('dbtojson_changes_')
+    try:
+        connection.execute("CREATE TABLE changes (key TEXT PRIMARY KEY, seq INTEGER, payload TEXT)")
+        upsert = ("INSERT INTO changes (key, seq, payload) VALUES (?, ?, ?) "
+                  "ON CONFLICT(key) DO UPDATE SET seq = excluded.seq, payload = excluded.payload")
+        
+        seq = 0
+        batch = []
+        sources = [iter_json_array(existing_path)] if os.path.exists(existing_path) else []
+        sources.append(iter(new_changes))
+        for source in sources:
+            for change in source:
+                batch.append((change[key], seq, json.dumps(change, ensure_ascii=False)))
+                seq += 1
+                if len(batch) >= batch_size:
+                    connection.executemany(upsert, batch)
+                    batch = []
+        if batch:
+            connection.executemany(upsert, batch)
+        connection.commit()
+        
+        temp_output = f"{output_path}.tmp"
+        with JsonArrayWriter(temp_output) as writer:
+            cursor = connection.execute("SELECT payload FROM changes ORDER BY seq")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                writer.write_records(json.loads(payload) for payload, in rows)
+        os.replace(temp_output, output_path)
+        return writer.count
+    
+    finally:
+        connection.close()
+        os.remove(db_path)
@@ -1,7 +1,10 @@
 import pandas as pd
 import sys
 import os
-from libs.database import execute_query
+from libs.database import execute_query, execute_query_chunks
+
+class ExtractionFailed(Exception):
+    """La consulta a la base de datos falló o superó su tiempo límite"""
 
 def get_articles_query_incremental():
     """Retorna la consulta SQL para obtener artículos"""
@@ -170,8 +173,12 @@ def get_articles_query_full():
     ORDER BY a.FechaInsertUpdate DESC
     """
 
-def getDataFromDatabase(use_incremental: bool = True):
-    """Lee datos desde la base de datos SQL Server"""
+def getDataFromDatabase(use_incremental: bool = True, timeout: float = None):
+    """
+    Lee datos desde la base de datos SQL Server (timeout en segundos por sentencia).
+    Retorna [df, 1] si la consulta se ejecutó (df vacío si no hubo filas) y
+    [DataFrame vacío, 0] si falló.
+    """
     try:
         print("#" * 5, " ¡Proceso de lectura de datos desde SQL Server! ", "#" * 5)
         print("#" * 5, " -Ejecutando consulta en la base de datos...")
@@ -184,11 +191,12 @@ def getDataFromDatabase(use_incremental: bool = True):
             query = get_articles_query_full()
             print("#" * 5, " -Usando consulta COMPLETA (todos los productos)")
 
-        df = execute_query(query)
+        df = execute_query(query, timeout=timeout)
         
         if len(df) == 0:
+            # Sin filas no es un error: p. ej. una hora sin cambios
             print("#" * 5, " No se encontraron datos en la consulta.")
-            return [pd.DataFrame(), 0]
+            return [pd.DataFrame(), 1]
         
         # Limpiar y procesar datos (similar a la función original pero simplificado)
         df = clean_dataframe(df)
@@ -220,6 +228,16 @@ def getDataFromDatabase(use_incremental: bool = True):
         
         return [pd.DataFrame(), 0]
 
+def iterDataFromDatabase(use_incremental: bool = True, chunksize: int = 50000, timeout: float = None):
+    """
+    Lee datos desde la base de datos por bloques ya limpios.
+    A diferencia de getDataFromDatabase, los errores se propagan al llamador
+    para que pueda descartar lo que se haya producido hasta el fallo.
+    """
+    query = get_articles_query_incremental() if use_incremental else get_articles_query_full()
+    for chunk in execute_query_chunks(query, chunksize, timeout=timeout):
+        yield clean_dataframe(chunk)
+
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """Limpia y procesa el DataFrame obtenido de la base de datos"""
     
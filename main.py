@@ -2,9 +2,22 @@ import config.setting as st
 import json
 from json.decoder import JSONDecodeError
 from datetime import datetime, date
-from libs.transform import getDataFromDatabase
+from libs.transform import getDataFromDatabase, iterDataFromDatabase, ExtractionFailed
 from libs.database import test_connection
-from libs.drive_manager import DriveManager
+from libs.drive_manager import DriveManager, GrowingFileUpload
+from libs.sinks import LocalDirectorySink, S3Sink
+from libs.publisher import MultiSinkPublisher
+from libs.deadline import Deadline, DeadlineExceeded
+from libs.journal import RunJournal
+from libs.runlock import RunLock
+from libs.fileio import write_json_atomic, read_json, JsonArrayWriter, dataframe_to_records
+from libs.formats import convert_json_artifact, artifact_filename, format_available
+from libs.article_index import build_article_index
+from libs.aggregates import DescriptionIndex, family_aggregates, iter_json_dataframes
+import pandas as pd
+from libs.spill import RecordStore, merge_changes_on_disk
+from libs.memory import data_budget_mb, estimate_json_memory_mb, exceeds_data_budget, report_peak_memory
+from concurrent.futures import ThreadPoolExecutor
 import os
 
 # Configuración (simplificada ya que no hay archivos de entrada)
@@ -15,28 +28,58 @@ OUTPUT_DIR_LOCAL = st.ouputDir
 VERSION_FILE = "version.json"
 CHANGES_FILE = "changes_articles.json"
 LAST_FULL_FILE = "last_full_data.json"
+INCREMENTAL_FILE = "incremental_extract.json"
 
 # Configuración Google Drive
 DRIVE_FOLDER = st.DRIVE_FOLDERS['ARTICULOS_JSON']
 
-def is_first_execution_of_day():
-    """Verifica si es la primera ejecución del día"""
+# Archivos de datos a publicar; version.json se publica siempre después de estos
+DATA_ARTIFACTS = [
+    ("Cambios incrementales", CHANGES_FILE),
+    ("Base completa", LAST_FULL_FILE)
+]
+DATA_ARTIFACT_KEYS = {CHANGES_FILE: "changes", LAST_FULL_FILE: "full"}
+
+# Formatos adicionales al JSON original ('columnar', 'msgpack'); se anuncian en version.json
+EXTRA_OUTPUT_FORMATS = ['columnar', 'msgpack']
+
+# Índice de búsqueda por referencia/referencia_proveedor publicado junto a la base completa
+BUILD_LOOKUP_INDEX = True
+INDEX_FILE = "last_full_data.index.sqlite"
+
+# Agregados por familia e índice de búsqueda sobre la descripción
+BUILD_CATALOG_AGGREGATES = True
+FAMILY_AGGREGATES_FILE = "family_aggregates.json"
+SEARCH_INDEX_FILE = "description_index.json"
+SEARCH_INDEX_STATE_FILE = "description_index_state.json"
+
+# Etapas derivadas de los JSON ya escritos (etapa del diario, habilitada)
+DERIVED_STAGES = [
+    ('formats', bool(EXTRA_OUTPUT_FORMATS)),
+    ('index', BUILD_LOOKUP_INDEX),
+    ('aggregates', BUILD_CATALOG_AGGREGATES)
+]
+
+def daily_flag_path():
+    """Archivo para tracking de ejecuciones diarias"""
     today = date.today().strftime("%Y-%m-%d")
+    return os.path.join(OUTPUT_DIR_LOCAL, f"last_execution_{today}.flag")
+
+def is_first_execution_of_day():
+    """Verifica si es la primera ejecución del día (sin consumir el flag)"""
+    return not os.path.exists(daily_flag_path())
+
+def record_execution_of_day():
+    """
+    Crea el flag del día una vez reiniciado el archivo de cambios; si la ejecución
+    falla antes, la siguiente sigue siendo la primera del día
+    """
+    os.makedirs(OUTPUT_DIR_LOCAL, exist_ok=True)
+    with open(daily_flag_path(), 'w') as f:
+        f.write(str(datetime.now().timestamp()))
     
-    # Archivo para tracking de ejecuciones diarias
-    daily_flag_file = os.path.join(OUTPUT_DIR_LOCAL, f"last_execution_{today}.flag")
-    
-    if os.path.exists(daily_flag_file):
-        return False
-    else:
-        # Crear flag para el día actual
-        os.makedirs(OUTPUT_DIR_LOCAL, exist_ok=True)
-        with open(daily_flag_file, 'w') as f:
-            f.write(str(datetime.now().timestamp()))
-        
-        # Limpiar flags de días anteriores
-        cleanup_old_flags()
-        return True
+    # Limpiar flags de días anteriores
+    cleanup_old_flags()
 
 def cleanup_old_flags():
     """Limpia archivos flag de días anteriores"""
@@ -82,91 +125,173 @@ def load_existing_changes_from_local():
     
     return []
 
-def save_accumulated_changes(new_changes, is_first_execution):
-    """Guarda los cambios acumulándolos o reiniciándolos según corresponda"""
+def save_accumulated_changes(new_changes: pd.DataFrame, is_first_execution):
+    """
+    Guarda los cambios acumulándolos o reiniciándolos según corresponda.
+    Un artículo que vuelve a cambiar conserva solo su último cambio, al final.
+    Retorna el número de productos acumulados.
+    """
+    local_changes_file = os.path.join(OUTPUT_DIR_LOCAL, CHANGES_FILE)
     
     if is_first_execution:
         # Primera ejecución del día: reiniciar archivo
         print("Primera ejecución del día: Reiniciando archivo de cambios")
         accumulated_changes = new_changes
+    elif exceeds_data_budget(estimate_json_memory_mb(local_changes_file)):
+        # Acumulado demasiado grande para el presupuesto: fusión por clave en disco
+        print("Ejecución posterior: Acumulando cambios en disco (supera el presupuesto de memoria)")
+        accumulated_count = merge_changes_on_disk(
+            local_changes_file, dataframe_to_records(new_changes), local_changes_file)
+        print(f"Cambios guardados: {accumulated_count} productos en total")
+        return accumulated_count
     else:
         # Ejecuciones posteriores: acumular cambios
         print("Ejecución posterior: Acumulando cambios")
-        existing_changes = load_existing_changes_from_local()
-        
-        # Crear diccionario para evitar duplicados por referencia
-        changes_dict = {change['referencia']: change for change in existing_changes}
-        
-        # Agregar/actualizar con nuevos cambios
-        for change in new_changes:
-            changes_dict[change['referencia']] = change
+        existing_changes = pd.DataFrame(load_existing_changes_from_local())
         
-        accumulated_changes = list(changes_dict.values())
+        # Fusión por referencia: los nuevos cambios reemplazan a los existentes
+        accumulated_changes = pd.concat(
+            [existing_changes, new_changes], ignore_index=True
+        ).drop_duplicates(subset='referencia', keep='last')
 
-    # Guardar respaldo local
-    local_changes_file = os.path.join(OUTPUT_DIR_LOCAL, CHANGES_FILE)
-    os.makedirs(OUTPUT_DIR_LOCAL, exist_ok=True)
-    
-    with open(local_changes_file , 'w', encoding='utf-8') as f:
-        json.dump(accumulated_changes, f, ensure_ascii=False, indent=2)
+    # Guardar respaldo local (conversión a registros solo al serializar)
+    write_json_atomic(local_changes_file, dataframe_to_records(accumulated_changes))
     
     print(f"Cambios guardados: {len(accumulated_changes)} productos en total")
-    return accumulated_changes
+    return len(accumulated_changes)
 
-def read_incremental_data_from_db():
-    """Lee datos incrementales (última hora) desde la base de datos"""
+def read_incremental_data_from_db(deadline: Deadline) -> pd.DataFrame:
+    """
+    Lee datos incrementales (última hora) desde la base de datos.
+    Lanza ExtractionFailed si no hay conexión o la consulta falla (incluido el
+    tiempo límite), para no confundir un fallo con "sin cambios".
+    """
+    deadline.ensure('incremental')
+    stage_deadline = deadline.stage('incremental')
+    
     if not test_connection():
-        print("Error: No se puede conectar a la base de datos")
-        return []
+        raise ExtractionFailed("No se puede conectar a la base de datos")
     
     # Usar consulta incremental (última hora)
-    df, success = getDataFromDatabase(use_incremental=True)
+    df, success = getDataFromDatabase(use_incremental=True, timeout=stage_deadline.remaining())
     
-    if success and len(df) > 0:
-        products = df.to_dict(orient='records')
-        
-        # Añadir timestamp de actualización
+    if not success:
+        if stage_deadline.expired():
+            raise DeadlineExceeded("Tiempo agotado en la consulta incremental")
+        raise ExtractionFailed("La consulta incremental falló")
+    
+    if len(df) > 0:
+        # Añadir timestamp de actualización como columna
         timestamp = int(datetime.now().timestamp() * 1000)
-        for product in products:
-            product['ultima_actualizacion'] = timestamp
-        
-        return products
+        return df.assign(ultima_actualizacion=timestamp)
     
-    return []
+    return pd.DataFrame()
 
-def generate_full_database():
-    """Genera el archivo completo de la base de datos"""
+def generate_full_database(deadline: Deadline):
+    """
+    Genera el archivo completo de la base de datos y retorna el número de productos.
+    Los datos se leen por bloques y pasan a un almacén en disco si superan el
+    presupuesto de memoria; la serialización a JSON también se hace por bloques.
+    """
+    deadline.ensure('full_snapshot')
+    stage_deadline = deadline.stage('full_snapshot')
     print("Generando archivo completo de base de datos...")
     
     if not test_connection():
         print("Error: No se puede conectar a la base de datos")
-        return False
+        return None
     
-    # Usar consulta completa (todos los productos)
-    df, success = getDataFromDatabase(use_incremental=False)
+    try:
+        with RecordStore(data_budget_mb(), read_chunksize=st.STREAM_CHUNK_ROWS) as store:
+            # Usar consulta completa (todos los productos)
+            chunks = iterDataFromDatabase(
+                use_incremental=False,
+                chunksize=st.STREAM_CHUNK_ROWS,
+                timeout=stage_deadline.remaining()
+            )
+            for df in chunks:
+                # El timeout de la sentencia no cubre la lectura ni la limpieza de los bloques
+                stage_deadline.check('full_snapshot')
+                store.append(df)
+            
+            if len(store) == 0:
+                print("#" * 5, " No se encontraron datos en la consulta.")
+                return None
+            
+            # Añadir timestamp de actualización
+            timestamp = int(datetime.now().timestamp() * 1000)
+            
+            # Guardar respaldo local
+            local_full_file = os.path.join(OUTPUT_DIR_LOCAL, LAST_FULL_FILE)
+            temp_full_file = f"{local_full_file}.tmp"
+            with JsonArrayWriter(temp_full_file) as writer:
+                for df in store.iter_chunks():
+                    stage_deadline.check('full_snapshot')
+                    writer.write_records(dataframe_to_records(df.assign(ultima_actualizacion=timestamp)))
+            os.replace(temp_full_file, local_full_file)
+            
+            storage = "disco" if store.spilled else "memoria"
+            print(f"Base de datos completa guardada: {writer.count} productos (procesados en {storage})")
+            return writer.count
     
-    if success and len(df) > 0:
-        products = df.to_dict(orient='records')
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"❌ Error generando base de datos completa: {e}")
+        return None
+
+def generate_full_database_streaming(deadline: Deadline, part_file: str, media: GrowingFileUpload):
+    """
+    Genera el archivo completo por bloques en part_file para que pueda subirse
+    mientras se escribe. Llama a media.finish() si termina correctamente o a
+    media.abort() en cualquier otro caso para que la subida no quede esperando.
+    """
+    finished = False
+    try:
+        deadline.ensure('full_snapshot')
+        stage_deadline = deadline.stage('full_snapshot')
+        print("Generando archivo completo de base de datos por bloques...")
+        
+        if not test_connection():
+            print("Error: No se puede conectar a la base de datos")
+            return None
         
         # Añadir timestamp de actualización
         timestamp = int(datetime.now().timestamp() * 1000)
-        for product in products:
-            product['ultima_actualizacion'] = timestamp
         
-        # Guardar respaldo local
-        local_full_file = os.path.join(OUTPUT_DIR_LOCAL, LAST_FULL_FILE)
-        os.makedirs(OUTPUT_DIR_LOCAL, exist_ok=True)
-
-        with open(local_full_file, 'w', encoding='utf-8') as f:
-            json.dump(products, f, ensure_ascii=False, indent=2)
-
-        print(f"Base de datos completa guardada: {len(products)} productos")
-        return products
+        with JsonArrayWriter(part_file) as writer:
+            chunks = iterDataFromDatabase(
+                use_incremental=False,
+                chunksize=st.STREAM_CHUNK_ROWS,
+                timeout=stage_deadline.remaining()
+            )
+            for df in chunks:
+                stage_deadline.check('full_snapshot')
+                writer.write_records(dataframe_to_records(df.assign(ultima_actualizacion=timestamp)))
+        
+        if writer.count == 0:
+            print("#" * 5, " No se encontraron datos en la consulta.")
+            return None
+        
+        media.finish()
+        finished = True
+        print(f"Base de datos completa guardada: {writer.count} productos")
+        return writer.count
     
-    return None
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"❌ Error generando base completa por bloques: {e}")
+        return None
+    finally:
+        if not finished:
+            media.abort()
 
-def generate_version_info(changes_count):
-    """Genera información de versión"""
+def generate_version_info(changes_count, formats=None, lookup_index=None, aggregates=None):
+    """
+    Genera información de versión (formats: archivos disponibles en cada formato;
+    lookup_index: archivo del índice de búsqueda; aggregates: archivos de agregados)
+    """
     timestamp = int(datetime.now().timestamp() * 1000)
     version = f"1.0.{timestamp}"
     
@@ -176,167 +301,535 @@ def generate_version_info(changes_count):
         "changes_count": changes_count,
         "data_source": "sql_server_database",
         "execution_time": datetime.now().isoformat(),
-        "sync_method": "google_drive_api"
+        "sync_method": "google_drive_api",
+        "formats": formats or {},
+        "lookup_index": lookup_index,
+        "aggregates": aggregates or {}
     }
 
     # Guardar respaldo local
     local_version_file = os.path.join(OUTPUT_DIR_LOCAL, VERSION_FILE)
-    os.makedirs(OUTPUT_DIR_LOCAL, exist_ok=True)
-    
-    with open(local_version_file, 'w', encoding='utf-8') as f:
-        json.dump(version_info, f, ensure_ascii=False, indent=2)
+    write_json_atomic(local_version_file, version_info)
     
     return version_info
 
-def upload_files_to_drive(accumulated_changes, full_database, version_info):
-    """Sube todos los archivos a Google Drive usando la API"""
+def create_sinks(deadline: Deadline):
+    """Destinos de publicación configurados en PUBLISH_SINKS"""
+    sinks = []
+    for key in st.PUBLISH_SINKS:
+        if key == 'drive':
+            # Los reintentos de Google Drive respetan el presupuesto de la etapa
+            sinks.append(DriveManager(deadline=deadline.stage('upload'), folder_path=DRIVE_FOLDER))
+        elif key == 'local':
+            if not st.LAN_SHARE_DIR:
+                print("⚠️ Carpeta compartida sin configurar (LAN_SHARE_DIR), se omite")
+                continue
+            sinks.append(LocalDirectorySink(st.LAN_SHARE_DIR, name="Carpeta compartida"))
+        elif key == 's3':
+            if not st.S3_CONFIG.get('bucket'):
+                print("⚠️ Destino S3 sin configurar (S3_BUCKET), se omite")
+                continue
+            sinks.append(S3Sink(**st.S3_CONFIG))
+        else:
+            print(f"⚠️ Destino de publicación desconocido: {key}")
+    return sinks
+
+def connect_sinks(deadline: Deadline) -> MultiSinkPublisher:
+    """Conecta en paralelo todos los destinos de publicación"""
+    deadline.ensure('upload')
     
     print("\n" + "-" * 50)
-    print("SUBIENDO ARCHIVOS A GOOGLE DRIVE")
+    print("PUBLICANDO ARCHIVOS")
     print("-" * 50)
     
-    # Inicializar DriveManager
-    drive_manager = DriveManager()
+    publisher = MultiSinkPublisher(create_sinks(deadline))
+    if not publisher.connect():
+        print("❌ Ningún destino de publicación disponible")
+    return publisher
+
+def upload_artifact(publisher: MultiSinkPublisher, label: str, filename: str, journal: RunJournal,
+                    sink_keys=None):
+    """
+    Publica un archivo de la carpeta de salida local en todos los destinos (o en
+    sink_keys) a la vez y registra cada publicación en el diario. Los destinos
+    que el diario marca como completados en un intento anterior se omiten.
+    Retorna (descripción, {clave del destino: éxito}).
+    """
+    stage = f"upload:{filename}"
+    keys = [sink.key for sink in publisher.sinks if sink_keys is None or sink.key in sink_keys]
+    if journal.is_done(stage):
+        print(f"\n⏭️ {label}: ya publicado en un intento anterior")
+        return (label, {key: True for key in keys})
     
-    try:
-        # Autenticar con Google Drive
-        drive_manager.authenticate()
-        
-        # Probar conexión
-        if not drive_manager.validate_connection():
-            print("❌ Error conectando con Google Drive")
-            return False
-        
-        upload_results = []
-        
-        # 1. Subir archivo de cambios incrementales
-        if accumulated_changes:
-            print(f"\n📤 Subiendo cambios incrementales ({len(accumulated_changes)} productos)...")
-            result = drive_manager.upload_json_data(
-                data=accumulated_changes,
-                filename=CHANGES_FILE,
-                folder_path=DRIVE_FOLDER
-            )
-            upload_results.append(("Cambios incrementales", result))
+    pending = [key for key in keys if not journal.is_done(f"{stage}:{key}")]
+    if pending:
+        print(f"\n📤 Publicando {label.lower()}...")
+        results = publisher.publish(os.path.join(OUTPUT_DIR_LOCAL, filename), filename, pending)
+        for key, result in results.items():
+            if result.pop('success'):
+                # Se registran la latencia y las métricas del destino (p. ej. MB/s en Drive)
+                journal.mark_done(f"{stage}:{key}", **result)
+    
+    sink_results = {key: journal.is_done(f"{stage}:{key}") for key in keys}
+    if publisher.sinks and all(journal.is_done(f"{stage}:{sink.key}") for sink in publisher.sinks):
+        journal.mark_done(stage)
+    return (label, sink_results)
+
+def publish_files(publisher: MultiSinkPublisher, upload_results, journal: RunJournal):
+    """
+    Completa la publicación: en cada destino sube version.json solo si todos los
+    archivos de datos están publicados en él, para que los clientes nunca vean
+    una versión cuyos datos no están disponibles, y muestra el resultado por destino
+    """
+    keys = [sink.key for sink in publisher.sinks]
+    ready = [key for key in keys if all(results.get(key) for _, results in upload_results)]
+    blocked = [key for key in keys if key not in ready]
+    
+    version_results = {key: False for key in blocked}
+    if ready:
+        version_results.update(upload_artifact(publisher, "Versión", VERSION_FILE, journal, ready)[1])
+    if blocked:
+        names = ", ".join(publisher.sink_name(key) for key in blocked)
+        print(f"\n⏸️ Información de versión no publicada en {names}: faltan archivos de datos")
+    upload_results.append(("Versión", version_results))
+    
+    # Mostrar resultados por archivo y por destino
+    print(f"\n📊 RESULTADOS DE PUBLICACIÓN:")
+    for file_type, results in upload_results:
+        statuses = " | ".join(
+            f"{publisher.sink_name(key)} {'✅' if results.get(key) else '❌'}" for key in keys)
+        print(f"  {file_type}: {statuses}")
+    
+    total_uploads = len(upload_results)
+    for key in keys:
+        successful_uploads = sum(1 for _, results in upload_results if results.get(key))
+        print(f"🎯 {publisher.sink_name(key)}: {successful_uploads}/{total_uploads} archivos publicados")
+    
+    published = [results.get(key, False) for _, results in upload_results for key in keys]
+    if published and all(published):
+        print("🎉 ¡Todos los archivos publicados correctamente en todos los destinos!")
+        return True
+    elif any(published):
+        print("⚠️ Algunos archivos publicados, pero hubo errores")
+        return True
+    else:
+        print("❌ No se pudieron publicar archivos")
+        return False
+
+def build_full_snapshot(deadline: Deadline, journal: RunJournal) -> bool:
+    """Etapa de base completa: genera last_full_data.json salvo que ya exista en el diario"""
+    if journal.is_done('full_snapshot'):
+        print(f"⏭️ Base de datos completa ya generada: {journal.get('full_snapshot')['records']} productos")
+        return True
+    
+    print("\n" + "-" * 40)
+    print("ACTUALIZANDO BASE DE DATOS COMPLETA")
+    print("-" * 40)
+
+    full_count = generate_full_database(deadline)
+    
+    if not full_count:
+        print("❌ Error generando base de datos completa")
+        return False
+    
+    print("✅ Base de datos completa actualizada exitosamente")
+    journal.mark_done('full_snapshot', records=full_count)
+    return True
+
+def build_format_artifacts(stage_deadline: Deadline, journal: RunJournal):
+    """
+    Etapa de formatos: genera los archivos de datos en los formatos adicionales a
+    partir de los JSON ya escritos. Retorna la lista de (descripción, archivo).
+    """
+    if not journal.is_done('formats'):
+        artifacts = []
+        formats = {"json": {DATA_ARTIFACT_KEYS[filename]: filename for _, filename in DATA_ARTIFACTS}}
         
-        # 2. Subir base de datos completa
-        if full_database:
-            print(f"\n📤 Subiendo base completa ({len(full_database)} productos)...")
-            result = drive_manager.upload_json_data(
-                data=full_database,
-                filename=LAST_FULL_FILE,
-                folder_path=DRIVE_FOLDER
-            )
-            upload_results.append(("Base completa", result))
+        for fmt in EXTRA_OUTPUT_FORMATS:
+            if not format_available(fmt):
+                print(f"⚠️ Formato {fmt} no disponible (falta la dependencia), se omite")
+                continue
+            
+            formats[fmt] = {}
+            for label, filename in DATA_ARTIFACTS:
+                stage_deadline.check('formats')
+                source_file = os.path.join(OUTPUT_DIR_LOCAL, filename)
+                target = artifact_filename(filename, fmt)
+                target_file = os.path.join(OUTPUT_DIR_LOCAL, target)
+                convert_json_artifact(source_file, fmt, target_file)
+                
+                ratio = os.path.getsize(target_file) / max(os.path.getsize(source_file), 1)
+                print(f"🗜️ {target}: {ratio:.0%} del tamaño del JSON original")
+                artifacts.append([f"{label} ({fmt})", target])
+                formats[fmt][DATA_ARTIFACT_KEYS[filename]] = target
         
-        # 3. Subir información de versión
-        print(f"\n📤 Subiendo información de versión...")
-        result = drive_manager.upload_json_data(
-            data=version_info,
-            filename=VERSION_FILE,
-            folder_path=DRIVE_FOLDER
-        )
-        upload_results.append(("Versión", result))
+        journal.mark_done('formats', artifacts=artifacts, formats=formats)
+    
+    return [tuple(artifact) for artifact in journal.get('formats')['artifacts']]
+
+def build_index_artifacts(stage_deadline: Deadline, journal: RunJournal):
+    """Etapa de índice: construye el índice de búsqueda a partir de la base completa"""
+    if not BUILD_LOOKUP_INDEX:
+        return []
+    
+    if not journal.is_done('index'):
+        stage_deadline.check('index')
+        index_file = os.path.join(OUTPUT_DIR_LOCAL, INDEX_FILE)
+        count = build_article_index(os.path.join(OUTPUT_DIR_LOCAL, LAST_FULL_FILE), index_file)
+        print(f"🔎 Índice de búsqueda generado: {count} artículos "
+              f"({os.path.getsize(index_file) / (1024 * 1024):.1f} MB)")
+        journal.mark_done('index', records=count)
+    
+    return [("Índice de búsqueda", INDEX_FILE)]
+
+def build_aggregate_artifacts(stage_deadline: Deadline, journal: RunJournal):
+    """
+    Etapa de agregados: totales por familia (recalculados en cada ejecución) e
+    índice invertido de descripciones, que se reconstruye desde la base completa
+    en la primera ejecución del día y después solo se actualiza con los cambios
+    """
+    if not BUILD_CATALOG_AGGREGATES:
+        return []
+    
+    if not journal.is_done('aggregates'):
+        full_file = os.path.join(OUTPUT_DIR_LOCAL, LAST_FULL_FILE)
+        state_file = os.path.join(OUTPUT_DIR_LOCAL, SEARCH_INDEX_STATE_FILE)
+        rebuild = journal.get('extract')['is_first_execution'] or not os.path.exists(state_file)
+        search_index = DescriptionIndex() if rebuild else DescriptionIndex.load(state_file)
+        full_references = set()
         
-        # Mostrar resultados
-        successful_uploads = sum(1 for _, success in upload_results if success)
-        total_uploads = len(upload_results)
+        def full_chunks():
+            # Una sola lectura de la base completa alimenta ambos agregados
+            for df in iter_json_dataframes(full_file, st.STREAM_CHUNK_ROWS):
+                stage_deadline.check('aggregates')
+                if rebuild:
+                    search_index.update(df)
+                else:
+                    full_references.update(df['referencia'].astype(str))
+                yield df
         
-        print(f"\n📊 RESULTADOS DE SUBIDA:")
-        for file_type, success in upload_results:
-            status = "✅ EXITOSO" if success else "❌ FALLÓ"
-            print(f"  {file_type}: {status}")
+        families = family_aggregates(full_chunks())
+        write_json_atomic(os.path.join(OUTPUT_DIR_LOCAL, FAMILY_AGGREGATES_FILE), families)
         
-        print(f"\n🎯 Total: {successful_uploads}/{total_uploads} archivos subidos exitosamente")
+        if not rebuild:
+            # Los cambios acumulados del día: reindexar es idempotente y no se pierden
+            # los cambios de ejecuciones anteriores cuyo estado no llegó a guardarse
+            for df in iter_json_dataframes(os.path.join(OUTPUT_DIR_LOCAL, CHANGES_FILE), st.STREAM_CHUNK_ROWS):
+                stage_deadline.check('aggregates')
+                search_index.update(df)
+            # Los artículos que salen de la base completa (p. ej. desactivados) no generan
+            # cambios: se eliminan del índice para que no apunte a referencias inexistentes
+            removed = search_index.retain(full_references)
+            if removed:
+                print(f"🧹 Índice de descripciones: {removed} artículos que ya no están en la base completa")
+        search_index.save(state_file, os.path.join(OUTPUT_DIR_LOCAL, SEARCH_INDEX_FILE))
         
-        if successful_uploads == total_uploads:
-            print("🎉 ¡Todos los archivos subidos correctamente a Google Drive!")
-            return True
-        elif successful_uploads > 0:
-            print("⚠️ Algunos archivos subidos, pero hubo errores")
-            return True
-        else:
-            print("❌ No se pudieron subir archivos a Google Drive")
-            return False
+        mode = "reconstruido" if rebuild else "actualizado con los cambios"
+        print(f"📈 Agregados: {len(families)} familias; índice de descripciones {mode} "
+              f"({len(search_index.tokens)} términos)")
+        journal.mark_done('aggregates', families=len(families), rebuilt=rebuild)
+    
+    return [
+        ("Agregados por familia", FAMILY_AGGREGATES_FILE),
+        ("Índice de descripciones", SEARCH_INDEX_FILE)
+    ]
+
+def build_derived_artifacts(deadline: Deadline, journal: RunJournal):
+    """
+    Artefactos derivados de los JSON ya escritos que se publican con ellos. Las
+    etapas pendientes comparten el presupuesto 'derived'.
+    """
+    pending = [stage for stage, enabled in DERIVED_STAGES if enabled and not journal.is_done(stage)]
+    if pending:
+        deadline.ensure('derived')
+    stage_deadline = deadline.stage('derived')
+    
+    return (build_format_artifacts(stage_deadline, journal)
+            + build_index_artifacts(stage_deadline, journal)
+            + build_aggregate_artifacts(stage_deadline, journal))
+
+def ensure_version_info(journal: RunJournal, accumulated_count: int):
+    """Etapa de versión: genera version.json salvo que ya exista en el diario"""
+    if journal.is_done('version'):
+        return read_json(os.path.join(OUTPUT_DIR_LOCAL, VERSION_FILE))
+    
+    version_info = generate_version_info(
+        accumulated_count,
+        formats=journal.get('formats')['formats'],
+        lookup_index=INDEX_FILE if journal.is_done('index') else None,
+        aggregates={
+            "families": FAMILY_AGGREGATES_FILE,
+            "description_index": SEARCH_INDEX_FILE
+        } if journal.is_done('aggregates') else None
+    )
+    journal.mark_done('version', version=version_info['version'])
+    return version_info
+
+def publish_sequential(deadline: Deadline, journal: RunJournal, accumulated_count: int):
+    """Genera la base completa y después publica todos los archivos"""
+    if not build_full_snapshot(deadline, journal):
+        return False
+    derived_artifacts = build_derived_artifacts(deadline, journal)
+    ensure_version_info(journal, accumulated_count)
+    
+    publisher = connect_sinks(deadline)
+    upload_results = [
+        upload_artifact(publisher, label, filename, journal)
+        for label, filename in DATA_ARTIFACTS + derived_artifacts
+    ]
+    return publish_files(publisher, upload_results, journal)
+
+def restart_upload_budget(publisher: MultiSinkPublisher, deadline: Deadline):
+    """
+    Nuevo presupuesto de la etapa de subida para las publicaciones que empiezan
+    ahora. En modo solapado los destinos se conectan al inicio de la ejecución y
+    el presupuesto tomado entonces se habría consumido durante la consulta completa.
+    """
+    drive_manager = publisher.sink('drive')
+    if drive_manager:
+        drive_manager.deadline = deadline.stage('upload')
+
+def upload_in_background(deadline: Deadline, journal: RunJournal, media: GrowingFileUpload = None):
+    """
+    Parte de la publicación que se ejecuta mientras se consulta la base completa:
+    conexión con los destinos, cambios incrementales y, en modo streaming, la
+    base completa a Google Drive a medida que se escribe
+    """
+    publisher = connect_sinks(deadline)
+    upload_results = [upload_artifact(publisher, "Cambios incrementales", CHANGES_FILE, journal)]
+    
+    streamed = False
+    if media:
+        drive_manager = publisher.sink('drive')
+        if drive_manager and publisher.connected.get('drive'):
+            print(f"\n📤 Subiendo base completa mientras se genera...")
+            streamed = drive_manager.upload_media(media, LAST_FULL_FILE, DRIVE_FOLDER)
+    
+    return publisher, upload_results, streamed
+
+def publish_pipelined(deadline: Deadline, journal: RunJournal, accumulated_count: int, streaming: bool):
+    """
+    Solapa la consulta de la base completa con la publicación. En modo streaming
+    la base completa se sube a Google Drive mientras se genera y al resto de
+    destinos al terminar. version.json solo se publica cuando han terminado
+    todas las subidas de datos.
+    """
+    full_file = os.path.join(OUTPUT_DIR_LOCAL, LAST_FULL_FILE)
+    part_file = f"{full_file}.part"
+    media = None
+    if streaming:
+        # El archivo debe existir antes de que la subida empiece a leerlo
+        os.makedirs(OUTPUT_DIR_LOCAL, exist_ok=True)
+        open(part_file, 'w').close()
+        media = GrowingFileUpload(part_file)
+    
+    full_count = None
+    try:
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='drive_upload') as executor:
+            background = executor.submit(upload_in_background, deadline, journal, media)
             
-    except Exception as e:
-        print(f"❌ Error general subiendo archivos: {e}")
+            if streaming:
+                print("\n" + "-" * 40)
+                print("ACTUALIZANDO BASE DE DATOS COMPLETA (STREAMING)")
+                print("-" * 40)
+                full_count = generate_full_database_streaming(deadline, part_file, media)
+                snapshot_ok = bool(full_count)
+            else:
+                snapshot_ok = build_full_snapshot(deadline, journal)
+            
+            publisher, upload_results, streamed = background.result()
+    finally:
+        if streaming:
+            # Se renombra tras la subida: en Windows no se puede reemplazar un archivo abierto.
+            # También si la parte en segundo plano falló, para no dejar el .part en output/
+            if full_count:
+                os.replace(part_file, full_file)
+                journal.mark_done('full_snapshot', records=full_count)
+            elif os.path.exists(part_file):
+                os.remove(part_file)
+    
+    if streaming:
+        if snapshot_ok:
+            if streamed:
+                journal.mark_done(f"upload:{LAST_FULL_FILE}:drive",
+                                  **publisher.sink('drive').stats(LAST_FULL_FILE))
+            print("✅ Base de datos completa actualizada exitosamente")
+        else:
+            print("❌ Error generando base de datos completa")
+    
+    if snapshot_ok:
+        restart_upload_budget(publisher, deadline)
+        upload_results.append(upload_artifact(publisher, "Base completa", LAST_FULL_FILE, journal))
+    
+    if not snapshot_ok:
         return False
+    
+    derived_artifacts = build_derived_artifacts(deadline, journal)
+    ensure_version_info(journal, accumulated_count)
+    upload_results.extend(
+        upload_artifact(publisher, label, filename, journal)
+        for label, filename in derived_artifacts
+    )
+    return publish_files(publisher, upload_results, journal)
 
 def main():
     """Función principal del proceso"""
+    
+    # Ejecución única: si hay otra en curso se le deja una ejecución pendiente
+    run_lock = RunLock()
+    if not run_lock.acquire():
+        holder = run_lock.holder() or {}
+        run_lock.request_followup()
+        print(f"🔒 Otra ejecución en curso (PID {holder.get('pid', '?')}); "
+              f"se registra una ejecución pendiente y se termina")
+        return
+    
+    # Una marca anterior a esta ejecución queda cubierta por ella
+    run_lock.take_pending()
+    
+    resume = True
+    while True:
+        try:
+            while True:
+                run_cycle(resume)
+                # Ciclo nuevo aunque el anterior haya fallado: debe ver los datos actuales
+                resume = False
+                
+                # Las ejecuciones solicitadas durante el ciclo se agrupan en un único ciclo adicional
+                pending = run_lock.take_pending()
+                if not pending:
+                    break
+                print(f"\n🔁 {pending} ejecución(es) solicitada(s) durante el proceso: ciclo de actualización adicional")
+        finally:
+            run_lock.release()
+        
+        # Una solicitud registrada entre la última comprobación y la liberación no la
+        # atendería nadie: se vuelve a tomar el bloqueo para atenderla (si otro proceso
+        # lo tiene, su ejecución es posterior a la solicitud y ya la cubre)
+        if not run_lock.has_pending() or not run_lock.acquire():
+            break
+        pending = run_lock.take_pending()
+        print(f"\n🔁 {pending} ejecución(es) solicitada(s) al terminar: ciclo de actualización adicional")
+    
+    report_peak_memory()
+
+def run_cycle(resume: bool = True):
+    """
+    Un ciclo completo de sincronización con su propio límite de tiempo. Con
+    resume=False no se retoma el diario de una ejecución fallida.
+    """
         
     print("=" * 60)
     print("INICIANDO PROCESO DE SINCRONIZACIÓN INCREMENTAL")
     print("=" * 60)
     
-    # Verificar si es primera ejecución del día
-    is_first_execution = is_first_execution_of_day()
-    print(f"¿Primera ejecución del día?: {is_first_execution}")
+    # Límite de tiempo global de la ejecución y presupuestos por etapa
+    deadline = Deadline()
     
-    # Leer datos incrementales desde la base de datos (última hora)
-    print("\n" + "-" * 40)
-    print("OBTENIENDO CAMBIOS INCREMENTALES DESDE SQL SERVER")
-    print("-" * 40)
+    # Diario de etapas: retoma una ejecución fallida reciente si la hay
+    journal = RunJournal()
+    if journal.start(resume=resume):
+        print(f"♻️ Retomando ejecución {journal.run_id} desde la etapa pendiente")
     
-    incremental_data = read_incremental_data_from_db()
+    try:
+        run_sync(deadline, journal)
+    except DeadlineExceeded as e:
+        journal.finish('failed')
+        print(f"\n⏰ Ejecución abortada por tiempo límite: {e}")
+        print("📋 Se conservan los archivos publicados en la ejecución anterior.")
+    except ExtractionFailed as e:
+        journal.finish('failed')
+        print(f"\n❌ Ejecución abortada: {e}")
+        print("📋 Se conservan los archivos publicados en la ejecución anterior.")
     
-    if len(incremental_data) > 0:
-        print(f"\nCambios incrementales obtenidos: {len(incremental_data)} registros")
+    print("\n" + "=" * 60)
+    print("PROCESO COMPLETADO")
+    print("=" * 60)
+
+def run_sync(deadline: Deadline, journal: RunJournal):
+    """
+    Ejecuta las etapas de sincronización dentro del tiempo límite.
+    Cada etapa completada queda registrada en el diario y se omite al reintentar,
+    reutilizando los archivos que ya escribió en la carpeta de salida.
+    """
+    incremental_file = os.path.join(OUTPUT_DIR_LOCAL, INCREMENTAL_FILE)
+    
+    # 1. Extracción incremental
+    if journal.is_done('extract'):
+        extract = journal.get('extract')
+        is_first_execution = extract['is_first_execution']
+        incremental_count = extract['records']
+        print(f"⏭️ Extracción incremental ya realizada: {incremental_count} registros")
+    else:
+        # Verificar si es primera ejecución del día
+        is_first_execution = is_first_execution_of_day()
+        print(f"¿Primera ejecución del día?: {is_first_execution}")
         
-        # Guardar cambios acumulados
+        # Leer datos incrementales desde la base de datos (última hora)
         print("\n" + "-" * 40)
-        print("PROCESANDO CAMBIOS ACUMULADOS")
+        print("OBTENIENDO CAMBIOS INCREMENTALES DESDE SQL SERVER")
         print("-" * 40)
         
-        accumulated_changes = save_accumulated_changes(incremental_data, is_first_execution)
-        
-        # Generar información de versión
-        version_info = generate_version_info(len(accumulated_changes))
-        
-        # Generar base de datos completa (siempre cuando hay cambios)
+        incremental_data = read_incremental_data_from_db(deadline)
+        write_json_atomic(incremental_file, dataframe_to_records(incremental_data))
+        incremental_count = len(incremental_data)
+        journal.mark_done('extract', records=incremental_count, is_first_execution=is_first_execution)
+    
+    if incremental_count == 0:
+        print("\n✅ No se detectaron cambios en la última hora.")
+        print("📋 No se generaron archivos de actualización.")
+        journal.finish('completed')
+        return
+    
+    print(f"\nCambios incrementales obtenidos: {incremental_count} registros")
+    
+    # 2. Guardar cambios acumulados
+    if journal.is_done('accumulate'):
+        accumulated_count = journal.get('accumulate')['records']
+        print(f"⏭️ Cambios acumulados ya guardados: {accumulated_count} productos")
+    else:
         print("\n" + "-" * 40)
-        print("ACTUALIZANDO BASE DE DATOS COMPLETA")
+        print("PROCESANDO CAMBIOS ACUMULADOS")
         print("-" * 40)
-
-        full_database = generate_full_database()
-        
-        if full_database:
-            print("✅ Base de datos completa actualizada exitosamente")
-            
-            # Subir archivos a Google Drive
-            drive_upload_success = upload_files_to_drive(
-                accumulated_changes, 
-                full_database, 
-                version_info
-            )
-            
-            if drive_upload_success:
-                print(f"\n🎉 ¡PROCESO COMPLETADO EXITOSAMENTE!")
-                print(f"📋 Versión generada: {version_info['version']}")
-                print(f"📁 Cambios incrementales: {len(incremental_data)} productos")
-                print(f"📊 Total acumulado: {len(accumulated_changes)} productos")
-                print(f"💾 Base completa: {len(full_database)} productos")
-                print(f"☁️ Archivos sincronizados con Google Drive")
-            else:
-                print(f"\n⚠️ Proceso completado con errores en Google Drive")
-                print(f"💾 Archivos guardados localmente como respaldo")
-            
-        else:
-            print("❌ Error generando base de datos completa")
-        
-        print(f"\n✅ Proceso completado exitosamente")
-        print(f"📋 Versión generada: {version_info['version']}")
-        print(f"📁 Cambios incrementales: {len(incremental_data)} productos")
-        print(f"📊 Total acumulado: {len(accumulated_changes)} productos")
         
+        incremental_data = pd.DataFrame(read_json(incremental_file, default=[]))
+        accumulated_count = save_accumulated_changes(incremental_data, is_first_execution)
+        if is_first_execution:
+            # El reinicio diario ya está hecho: las siguientes ejecuciones acumulan
+            record_execution_of_day()
+        journal.mark_done('accumulate', records=accumulated_count)
+    
+    # 3-5. Base de datos completa, versión y publicación en todos los destinos
+    if st.PIPELINE_MODE != 'sequential' and not journal.is_done('full_snapshot'):
+        publish_success = publish_pipelined(
+            deadline, journal, accumulated_count, streaming=st.PIPELINE_MODE == 'streaming')
     else:
-        print("\n✅ No se detectaron cambios en la última hora.")
-        print("📋 No se generaron archivos de actualización.")
+        publish_success = publish_sequential(deadline, journal, accumulated_count)
     
-    print("\n" + "=" * 60)
-    print("PROCESO COMPLETADO")
-    print("=" * 60)
+    if not journal.is_done('full_snapshot'):
+        print(f"📁 Cambios incrementales: {incremental_count} productos")
+        print(f"📊 Total acumulado: {accumulated_count} productos")
+        journal.finish('failed')
+        return
+    
+    full_count = journal.get('full_snapshot')['records']
+    version = journal.get('version')['version']
+    artifacts = DATA_ARTIFACTS + build_derived_artifacts(deadline, journal) + [("Versión", VERSION_FILE)]
+    all_uploaded = all(journal.is_done(f"upload:{filename}") for _, filename in artifacts)
+    
+    if publish_success and all_uploaded:
+        print(f"\n🎉 ¡PROCESO COMPLETADO EXITOSAMENTE!")
+        print(f"📋 Versión generada: {version}")
+        print(f"📁 Cambios incrementales: {incremental_count} productos")
+        print(f"📊 Total acumulado: {accumulated_count} productos")
+        print(f"💾 Base completa: {full_count} productos")
+        print(f"☁️ Archivos publicados en todos los destinos")
+    else:
+        print(f"\n⚠️ Proceso completado con errores en la publicación")
+        print(f"💾 Archivos guardados localmente como respaldo")
+        print(f"♻️ Un reintento continuará desde las subidas pendientes")
+    
+    journal.finish('completed' if all_uploaded else 'failed')
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()